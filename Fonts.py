@@ -1,9 +1,125 @@
+# ── Fonts.py ─────────────────────────────────────────────────
+"""
+Process-wide font registry.
+
+Every (path, size) is opened with FreeType once per process and kept as a
+FontFace together with its line metrics and an advance-width table, so
+per-verse work never touches the font file again.  `Fonts` is the list
+of faces a job rotates through.
+"""
+import string
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+from PIL import ImageFont
+
+FALLBACK_FONT = Path(__file__).resolve().parent / "sources" / "fonts" / "PermanentMarker-Regular.ttf"
+
+LINE_SPACING = 4   # ImageDraw.multiline_text default
+
+# characters whose advances are measured up front; anything else on first use
+PRELOAD_CHARS = string.printable.strip() + " ‘’“”–—…"
+
+
+def _load(path, size) -> ImageFont.FreeTypeFont:
+    """Try chosen font → fallback font → built-in default (never crash)."""
+    try:
+        return ImageFont.truetype(str(path), size=size)
+    except OSError:
+        print("WARNING – font unusable, falling back to:", FALLBACK_FONT, flush=True)
+        try:
+            return ImageFont.truetype(str(FALLBACK_FONT), size=size)
+        except OSError:
+            print("ERROR – fallback font missing; using built-in default", flush=True)
+            return ImageFont.load_default(size)
+
+
+class FontFace:
+    """One loaded face at one size plus its precomputed metrics."""
+
+    def __init__(self, path, size: int):
+        self.path = str(path)
+        self.size = size
+        self.font = _load(path, size)
+
+        self.ascent, self.descent = self.font.getmetrics()
+        self.line_height = self.ascent + self.descent
+        # baseline-to-baseline distance PIL uses for multiline text (spacing=4)
+        self.line_pitch = self.font.getbbox("A")[3] + LINE_SPACING
+        self.advances = {ch: self.font.getlength(ch) for ch in PRELOAD_CHARS}
+        self.kerning: dict[str, float] = {}
+        self.words: dict[str, float] = {}
+
+    def advance(self, ch: str) -> float:
+        adv = self.advances.get(ch)
+        if adv is None:
+            adv = self.advances[ch] = self.font.getlength(ch)
+        return adv
+
+    def kern(self, a: str, b: str) -> float:
+        pair = a + b
+        k = self.kerning.get(pair)
+        if k is None:
+            k = self.kerning[pair] = self.font.getlength(pair) - self.advance(a) - self.advance(b)
+        return k
+
+    def text_width(self, text: str) -> float:
+        """Advance width of text, kerning included, from the cached tables."""
+        if not text:
+            return 0.0
+        width = self.advance(text[0])
+        for a, b in zip(text, text[1:]):
+            width += self.advance(b) + self.kern(a, b)
+        return width
+
+    def word_width(self, word: str) -> float:
+        w = self.words.get(word)
+        if w is None:
+            w = self.words[word] = self.text_width(word)
+        return w
+
+
+_faces: dict[tuple[str, int], FontFace] = {}
+_lock = threading.Lock()
+
+
+def get_face(path, size: int) -> FontFace:
+    key = (str(path), size)
+    face = _faces.get(key)
+    if face is None:
+        with _lock:
+            face = _faces.get(key)
+            if face is None:
+                face = _faces[key] = FontFace(path, size)
+    return face
+
+
+class FontSpec(NamedTuple):
+    path: str
+    size: int
+    chars_limit: int
+
+
 class Fonts:
-    fonts_path: str
-    fonts_size: int
-    fonts_chars_limit: int
+    """The fonts a job rotates through: (path, size, max chars per line)."""
 
     def __init__(self, fonts_path, fonts_size, fonts_chars_limit):
-        self.fonts_path = fonts_path
-        self.fonts_size = fonts_size
-        self.fonts_chars_limit = fonts_chars_limit
+        self.specs = [FontSpec(str(p), s, c)
+                      for p, s, c in zip(fonts_path, fonts_size, fonts_chars_limit)]
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __getitem__(self, i) -> FontSpec:
+        return self.specs[i]
+
+    def face(self, i) -> FontFace:
+        spec = self.specs[i]
+        return get_face(spec.path, spec.size)
+
+    def warm(self):
+        """Load every face now (e.g. at worker start) instead of mid-job."""
+        for i in range(len(self.specs)):
+            self.face(i)
+        return self
@@ -0,0 +1,103 @@
+# ── audio_beds.py ────────────────────────────────────────────
+"""
+Pre-encoded audio beds.
+
+Each MP3 in audio/ is converted once to AAC-in-MP4 (.m4a) with the same
+parameters the render would use, optionally also pre-cut to common clip
+lengths.  The render then stream-copies the bed (`-c:a copy`) instead of
+decoding and re-encoding the MP3 for every video.
+
+    python audio_beds.py [audio_folder] [length …]    # e.g. … audio 10 15 20
+
+Beds are only used while their sidecar matches the source's size, mtime
+and PROFILE; otherwise the render falls back to encoding the raw MP3.
+"""
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import storage
+
+PROFILE = {"codec": "aac", "bitrate": "192k", "sample_rate": 44100, "channels": 2}
+
+BED_DIR = Path(os.getenv("VIDEOBOT_BED_DIR", storage.CACHE_DIR / "audio_beds"))
+
+
+def bed_path(audio_file: str, length: int | None = None) -> Path:
+    src = Path(audio_file).resolve()
+    folder_id = hashlib.sha1(str(src.parent).encode()).hexdigest()[:8]
+    suffix = f"-{length}s" if length else ""
+    return BED_DIR / f"{src.stem}-{folder_id}{suffix}.m4a"
+
+
+def _signature(audio_file: str, length: int | None) -> dict:
+    st = os.stat(audio_file)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "length": length, "profile": PROFILE}
+
+
+def is_fresh(audio_file: str, length: int | None = None) -> bool:
+    bed = bed_path(audio_file, length)
+    try:
+        with open(bed.with_suffix(".json"), encoding="utf-8") as f:
+            return bed.exists() and json.load(f) == _signature(audio_file, length)
+    except (OSError, ValueError):
+        return False
+
+
+def resolve(audio_file: str, duration: float) -> str | None:
+    """
+    Shortest fresh bed that still covers `duration` seconds, falling back
+    to the full-length bed; None when the track has not been prepared.
+    """
+    lengths = sorted(int(p.stem.rsplit("-", 1)[1][:-1])
+                     for p in BED_DIR.glob(f"{glob.escape(bed_path(audio_file).stem)}-*s.m4a"))
+    for length in lengths:
+        if length >= duration and is_fresh(audio_file, length):
+            return str(bed_path(audio_file, length))
+    if is_fresh(audio_file):
+        return str(bed_path(audio_file))
+    return None
+
+
+def build_bed(audio_file: str, length: int | None = None) -> Path:
+    p = PROFILE
+    bed = bed_path(audio_file, length)
+    bed.parent.mkdir(parents=True, exist_ok=True)
+    tmp = bed.with_name(f".{bed.stem}.{os.getpid()}.m4a")
+    cut = ["-t", str(length)] if length else []
+
+    subprocess.check_call([
+        "ffmpeg", "-loglevel", "error", "-y", "-i", audio_file, "-vn", *cut,
+        "-c:a", p["codec"], "-b:a", p["bitrate"],
+        "-ar", str(p["sample_rate"]), "-ac", str(p["channels"]),
+        "-movflags", "+faststart", str(tmp),
+    ])
+    os.replace(tmp, bed)
+    with open(bed.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(_signature(audio_file, length), f)
+    return bed
+
+
+def build_beds(audio_folder: str, lengths=(), force=False) -> list[Path]:
+    """Encode the full bed plus one pre-cut bed per length for every stale track."""
+    built = []
+    for f in sorted(os.listdir(audio_folder)):
+        if not f.endswith(".mp3"):
+            continue
+        src = f"{audio_folder}/{f}"
+        for length in (None, *lengths):
+            if force or not is_fresh(src, length):
+                print(f"building audio bed for {f}" + (f" ({length}s)" if length else ""), flush=True)
+                built.append(build_bed(src, length))
+    return built
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else str(storage.BASE_DIR / "audio")
+    done = build_beds(folder, [int(x) for x in sys.argv[2:]])
+    print(f"{len(done)} audio bed(s) rebuilt in {BED_DIR}")
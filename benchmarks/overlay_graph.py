@@ -0,0 +1,56 @@
+# ── benchmarks/overlay_graph.py ──────────────────────────────
+"""
+Encode-fps of the separate-layer filter graph (logo, reference sprite and
+verse as three overlays) vs the pre-composited one (overlay + overlay).
+
+    python benchmarks/overlay_graph.py [video_file] [runs]
+
+Both graphs render the same verse, reference, logo and background; the
+verse PNG / text layer are built before timing starts.
+"""
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import ffmpeg        # noqa: E402  (project module, not ffmpeg-python)
+import media_probe   # noqa: E402
+import proxies       # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+
+VERSE = ("Whatever you do, work heartily, as for the Lord and not for men, "
+         "knowing that from the Lord you will receive the inheritance as your reward.")
+REF   = "Colossians 3:23-24"
+
+
+def bench(video_file: str, composite: bool, runs: int) -> float:
+    with tempfile.TemporaryDirectory() as out_dir:
+        cmd = ffmpeg.prepare_video(
+            VERSE, REF, str(ROOT / "sources" / "MouldyCheeseRegular-WyMWG.ttf"),
+            REF.replace(":", ""), video_file, str(next((ROOT / "audio").glob("*.mp3"))),
+            str(ROOT / "sources" / "logo.png"),
+            str(ROOT / "sources" / "fonts" / "HeyMarch.ttf"), 75, 33,
+            out_dir, "/bench.mp4", composite=composite)
+        cmd = [a for a in cmd if a != "-stats"]
+
+        frames = media_probe.probe(proxies.resolve(video_file))["duration"] * 24
+        best = float("inf")
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            subprocess.check_call(cmd)
+            best = min(best, time.perf_counter() - t0)
+    return frames / best
+
+
+if __name__ == "__main__":
+    video = sys.argv[1] if len(sys.argv) > 1 else str(next((ROOT / "videos").glob("*.mp4")))
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    separate = bench(video, composite=False, runs=runs)
+    composite = bench(video, composite=True, runs=runs)
+    print(f"separate  graph: {separate:7.1f} fps")
+    print(f"composite graph: {composite:7.1f} fps   ({composite / separate:.2f}x)")
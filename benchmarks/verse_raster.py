@@ -0,0 +1,92 @@
+# ── benchmarks/verse_raster.py ───────────────────────────────
+"""
+Microbenchmark: verse_handler.render_verse (tight-bbox canvases) vs the
+previous full-canvas path (two (w, h//2) RGBA images, composite, crop).
+
+    python benchmarks/verse_raster.py [verses_json] [n]
+
+Also checks that both paths produce identical pixels, and times the
+glyph-atlas rasterizer (glyph_atlas.py) and compares its cards with
+render_verse the same way.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import Fonts          # noqa: E402
+import glyph_atlas    # noqa: E402
+import text_layout    # noqa: E402
+import verse_handler  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+FONT = ROOT / "sources" / "fonts" / "CoffeeJellyUmai.ttf"
+SIZE = (1080, 960)
+
+
+def render_full_canvas(text, font_path, font_size, image_size, text_color=(255, 255, 255, 255)):
+    """The pre-tight-bbox implementation, kept here as the baseline."""
+    img = Image.new("RGBA", image_size, color=(190, 190, 190, 0))
+    face = Fonts.get_face(font_path, font_size)
+    wrapped = "\n".join(text_layout.wrap(text, face, img.size[0] * verse_handler.TEXT_WIDTH))
+
+    shadow = Image.new("RGBA", img.size, (255, 255, 255, 0))
+    ImageDraw.Draw(shadow).text(
+        (img.size[0] / 2 - 1, img.size[1] / 2 + 4), wrapped, font=face.font,
+        fill=verse_handler.SHADOW_COLOR, anchor="mm", align="center")
+    ImageDraw.Draw(img).text(
+        (img.size[0] / 2, img.size[1] / 2), wrapped, font=face.font,
+        fill=text_color, anchor="mm", align="center")
+    return Image.alpha_composite(shadow, img).crop(img.getbbox())
+
+
+def timed(fn, verses):
+    t0 = time.perf_counter()
+    for v in verses:
+        fn(v)
+    return (time.perf_counter() - t0) / len(verses) * 1000
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else ROOT / "sources" / "verses_data" / "motivation_data.json"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with open(src, encoding="utf-8") as f:
+        verses = json.load(f)["verses"][:n]
+
+    Fonts.get_face(FONT, 95)   # font load is not what we measure
+
+    mismatches = sum(
+        ImageChops.difference(render_full_canvas(v, FONT, 95, SIZE),
+                              verse_handler.render_verse(v, FONT, 95, 0, SIZE)).getbbox() is not None
+        for v in verses)
+
+    full = timed(lambda v: render_full_canvas(v, FONT, 95, SIZE), verses)
+    tight = timed(lambda v: verse_handler.render_verse(v, FONT, 95, 0, SIZE), verses)
+    print(f"full canvas: {full:6.2f} ms/verse")
+    print(f"tight bbox : {tight:6.2f} ms/verse   ({full / tight:.1f}x)")
+    print(f"pixel mismatches: {mismatches}/{len(verses)}")
+
+    def atlas(v):
+        return glyph_atlas.render_verse(v, FONT, 95, SIZE, SIZE[0] * verse_handler.TEXT_WIDTH,
+                                        shadow_color=verse_handler.SHADOW_COLOR)
+
+    atlas(verses[0])           # build the atlas outside the timing
+    blit = timed(atlas, verses)
+    print(f"glyph atlas: {blit:6.2f} ms/verse   ({full / blit:.1f}x)")
+
+    same_size = identical = 0
+    worst = 0
+    for v in verses:
+        a, b = verse_handler.render_verse(v, FONT, 95, 0, SIZE), atlas(v)
+        if a.size == b.size:
+            same_size += 1
+            d = np.abs(np.asarray(a).astype(int) - np.asarray(b)).max()
+            identical += d == 0
+            worst = max(worst, d)
+    print(f"atlas: {same_size}/{len(verses)} same size, {identical} pixel-identical, "
+          f"max channel diff {worst}")
@@ -6,12 +6,32 @@ Central Celery object for both worker and FastAPI.
   'redis' service (hostname = redis).
 • When you run the code locally *outside* Docker the defaults fall back
   to redis://localhost:6379 so nothing breaks.
+• Every stage of a job has its own queue (QUEUES / ROUTES), so light
+  work (probing, text rendering, CSV) runs on a high-concurrency thread
+  pool while encode workers are sized to the cores – see
+  docker-compose.yml.  A worker started without -Q consumes them all.
 """
 import os
 from celery import Celery
+from kombu import Queue
 
 broker_url  = os.getenv("CELERY_BROKER_URL",  "redis://redis:6379/0")
 result_url  = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
 
 celery = Celery("videobot", broker=broker_url, backend=result_url)
 celery.conf.task_track_started = True
+
+# ---------- stage routing -----------------------------------------
+QUEUES = ("probe", "render_text", "encode", "package")
+ROUTES = {
+    "videobot.tasks.run_video_job": {"queue": "probe"},        # plan + ffprobe the library
+    "videobot.tasks.render_text":   {"queue": "render_text"},  # verse card, spec, cache lookup
+    "videobot.tasks.encode_video":  {"queue": "encode"},       # libx264, CPU-bound
+    "videobot.tasks.finish_job":    {"queue": "package"},      # CSV manifest + history
+}
+
+celery.conf.task_queues = [Queue(name) for name in QUEUES]
+celery.conf.task_default_queue = "probe"
+celery.conf.task_routes = ROUTES
+# one task at a time per pool slot: a prefetched encode would sit behind a long one
+celery.conf.worker_prefetch_multiplier = 1
@@ -0,0 +1,93 @@
+# ── compositor.py ────────────────────────────────────────────
+"""
+Pre-rendered text layers for the render graph.
+
+The reference line is rasterised once per (text, font, size, colour) into
+a cached PNG sprite, so ffmpeg never runs drawtext (no per-frame FreeType,
+no `:` escaping).  In composite mode the sprite and the verse PNG are
+further painted into ONE RGBA layer, cropped to their joint bounding box:
+
+    separate:   bg ─ overlay(logo) ─ overlay(ref sprite) ─ overlay(verse)
+    composite:  bg ─ overlay(logo) ─ overlay(text layer)
+
+Text layers are unique per video, so cache/layers is kept under
+VIDEOBOT_TEXT_CACHE_MB (default 1000) by storage.prune().
+"""
+import hashlib
+import os
+import threading
+
+from PIL import Image, ImageDraw
+
+import storage
+import verse_handler
+
+COMPOSITE_OVERLAY = os.getenv("VIDEOBOT_COMPOSITE", "1") != "0"
+
+REF_FONT_SIZE = 42
+REF_COLOR     = (255, 255, 255, 255)
+LAYER_CAP     = int(float(os.getenv("VIDEOBOT_TEXT_CACHE_MB", 1000)) * 1024 * 1024)
+
+
+def render_reference(text: str, font_path: str, font_size=REF_FONT_SIZE,
+                     color=REF_COLOR) -> Image.Image:
+    """Reference line as a tight RGBA sprite (top = ascender, like drawtext)."""
+    font = verse_handler.load_font_safe(font_path.replace("\\:", ":"), font_size)
+    left, top, right, bottom = font.getbbox(text, anchor="la")
+    sprite = Image.new("RGBA", (max(1, right - left), max(1, bottom)), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).text((-left, 0), text, font=font, fill=color, anchor="la")
+    return sprite
+
+
+def reference_sprite(text: str, font_path: str, font_size=REF_FONT_SIZE,
+                     color=REF_COLOR) -> str:
+    """
+    Cached render_reference(): PNGs live in cache/refs keyed by a hash of
+    (text, font file contents, size, colour), so every job and customer
+    shares them.
+    """
+    font_path = font_path.replace("\\:", ":")
+    font_id = storage.file_digest(font_path)
+    key = hashlib.sha1(repr((text, font_id, font_size, tuple(color))).encode()).hexdigest()
+
+    out = storage.cache_path("refs", f"{key}.png")
+    if not out.exists():
+        tmp = out.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.png")
+        render_reference(text, font_path, font_size, color).save(tmp)
+        os.replace(tmp, out)
+    return str(out)
+
+
+def compose_text_layer(verse_img: str, ref_img: str,
+                       frame_w: int, ref_y: int, txt_y: int):
+    """
+    Paint the verse (top at ref_y) and the reference (top at txt_y), both
+    horizontally centred in a frame_w-wide frame, into one layer.
+    Returns (png_path, x, y) – where to overlay the layer on the frame.
+    """
+    with Image.open(verse_img) as im:
+        verse = im.convert("RGBA")
+    with Image.open(ref_img) as im:
+        ref_sprite = im.convert("RGBA")
+
+    vx = (frame_w - verse.width) // 2
+    rx = (frame_w - ref_sprite.width) // 2
+    x0, y0 = min(vx, rx), min(ref_y, txt_y)
+    x1 = max(vx + verse.width, rx + ref_sprite.width)
+    y1 = max(ref_y + verse.height, txt_y + ref_sprite.height)
+
+    layer = Image.new("RGBA", (x1 - x0, y1 - y0), (0, 0, 0, 0))
+    layer.alpha_composite(verse, (vx - x0, ref_y - y0))
+    layer.alpha_composite(ref_sprite, (rx - x0, txt_y - y0))
+
+    # content-addressed: identical layers (same verse, ref, position) are reused
+    key = hashlib.sha1(layer.tobytes() + repr(layer.size).encode()).hexdigest()
+    out = storage.cache_path("layers", f"{key}.png")
+    if out.exists():
+        storage.touch(out)
+    else:
+        tmp = out.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.png")
+        layer.save(tmp, compress_level=1)
+        os.replace(tmp, out)
+        storage.wrote("layers", LAYER_CAP)
+    return str(out), x0, y0
@@ -0,0 +1,333 @@
+# ── corpus.py ────────────────────────────────────────────────
+"""
+Indexed verse corpus across every quote file in sources/verses_data
+(legacy .json, .ndjson / .jsonl, .csv – see json_handler).
+
+    python corpus.py [verses_data folder]     # (re)ingest + list topics
+
+• One row per distinct verse text and translation: reference, translation, length in
+  characters and words, and a hash of the normalised text (case, quotes,
+  dashes and punctuation ignored), so the copies in merged_data.json and
+  the topic files collapse into one verse with several topic tags.
+• Topic = file name without "_data" / translation suffix
+  (love_data_KJV.json → topic "love", translation "KJV").  Aggregate
+  files (merged_data.json) add verses but no tag.
+• Ingest is incremental: a file is re-read only when its size / mtime
+  changed, and every query re-checks those (a few stat() calls), so a
+  running process sees edited files.  Each verse remembers the files it
+  came from; one no file holds any more is deleted.  sample() only
+  loads matching ids, never a whole file.
+• Near-duplicates (same verse with a word or two changed, partial
+  copies) are clustered with MinHash/LSH after every ingest (dedup.py);
+  sample() draws at most one verse per cluster.
+"""
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+import dedup
+import json_handler
+import storage
+
+DB_NAME     = "corpus.sqlite"
+VERSES_DIR  = storage.BASE_DIR / "sources" / "verses_data"
+DEFAULT_TRANSLATION = "ESV"
+AGGREGATES  = {"merged"}          # topic-less collections of other files
+ALL_TOPICS  = "all"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verses (
+    id          INTEGER PRIMARY KEY,
+    hash        TEXT NOT NULL,
+    verse       TEXT NOT NULL,
+    reference   TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    length      INTEGER NOT NULL,
+    words       INTEGER NOT NULL,
+    UNIQUE (hash, translation)
+);
+CREATE INDEX IF NOT EXISTS verses_length ON verses (length);
+CREATE TABLE IF NOT EXISTS tags (
+    topic    TEXT NOT NULL,
+    verse_id INTEGER NOT NULL REFERENCES verses (id),
+    PRIMARY KEY (topic, verse_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dedup (
+    verse_id   INTEGER PRIMARY KEY REFERENCES verses (id),
+    sig        BLOB NOT NULL,
+    cluster_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dedup_cluster ON dedup (cluster_id);
+CREATE TABLE IF NOT EXISTS sources (
+    file     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    verses   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS origins (
+    file     TEXT NOT NULL,
+    verse_id INTEGER NOT NULL REFERENCES verses (id),
+    PRIMARY KEY (file, verse_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS origins_verse ON origins (verse_id);
+"""
+
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-"})
+_lock = threading.Lock()
+
+
+def _db():
+    conn = storage.connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).translate(_QUOTES).lower()
+    text = re.sub(r"[^\w\s]", "", text)
+    return " ".join(text.split())
+
+
+def verse_hash(text: str) -> str:
+    return hashlib.sha1(normalize(text).encode()).hexdigest()
+
+
+def parse_name(path) -> tuple[str | None, str]:
+    """<topic>_data[_<TRANSLATION>].json → (topic or None, translation)."""
+    stem = Path(path).stem
+    topic, _, suffix = stem.partition("_data")
+    translation = suffix.lstrip("_") or DEFAULT_TRANSLATION
+    return (None if topic in AGGREGATES else topic), translation
+
+
+# ---------- INGEST ------------------------------------------------
+def _unlink_file(conn, name: str) -> list[int]:
+    """Drop a file's tags and origins (inside a transaction); returns its verse ids."""
+    topic, translation = parse_name(name)
+    if topic:       # love_data.json and love_data_KJV.json share a topic
+        conn.execute("DELETE FROM tags WHERE topic = ? AND verse_id IN "
+                     "(SELECT id FROM verses WHERE translation = ?)", (topic, translation))
+    ids = [r[0] for r in conn.execute("SELECT verse_id FROM origins WHERE file = ?", (name,))]
+    conn.execute("DELETE FROM origins WHERE file = ?", (name,))
+    return ids
+
+
+def _delete_orphans(conn, ids: list[int]) -> int:
+    """Delete those of ids no source file holds any more (with their tags and signatures)."""
+    n = 0
+    for i in range(0, len(ids), 500):               # SQLite variable limit
+        chunk = ids[i:i + 500]
+        orphans = [r[0] for r in conn.execute(
+            f"SELECT id FROM verses WHERE id IN ({','.join('?' * len(chunk))}) "
+            "AND id NOT IN (SELECT verse_id FROM origins)", chunk)]
+        for table, col in (("tags", "verse_id"), ("dedup", "verse_id"), ("verses", "id")):
+            conn.executemany(f"DELETE FROM {table} WHERE {col} = ?", [(o,) for o in orphans])
+        n += len(orphans)
+    return n
+
+
+def ingest_file(path, conn=None) -> int:
+    """(Re)load one quote file (legacy .json, .ndjson or .csv), streamed."""
+    conn = conn or _db()
+    name = Path(path).name
+    topic, translation = parse_name(path)
+
+    st = os.stat(path)
+    n = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        previous = _unlink_file(conn, name)
+        for verse, ref in json_handler.iter_quotes(path):
+            n += 1
+            h = verse_hash(verse)
+            conn.execute(
+                "INSERT OR IGNORE INTO verses (hash, verse, reference, translation, length, words) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (h, verse, ref, translation, len(verse), len(verse.split())))
+            conn.execute(
+                "INSERT OR IGNORE INTO origins SELECT ?, id FROM verses "
+                "WHERE hash = ? AND translation = ?", (name, h, translation))
+            if topic:
+                conn.execute(
+                    "INSERT OR IGNORE INTO tags SELECT ?, id FROM verses "
+                    "WHERE hash = ? AND translation = ?", (topic, h, translation))
+        _delete_orphans(conn, previous)             # removed / corrected verses
+        conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                     (name, st.st_size, st.st_mtime_ns, n))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return n
+
+
+def forget_file(name: str, conn=None) -> int:
+    """A quote file is gone: drop its tags and the verses only it held."""
+    conn = conn or _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        n = _delete_orphans(conn, _unlink_file(conn, name))
+        conn.execute("DELETE FROM sources WHERE file = ?", (name,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return n
+
+
+def recluster(conn=None) -> int:
+    """
+    MinHash-sign verses that have no signature yet, then re-run LSH
+    clustering over all stored signatures (dedup.py).  Returns the
+    number of clusters.
+    """
+    conn = conn or _db()
+    new = conn.execute("SELECT id, verse FROM verses WHERE id NOT IN "
+                       "(SELECT verse_id FROM dedup)").fetchall()
+    rows = [(r["id"], dedup.signature(normalize(r["verse"])).tobytes(), r["id"]) for r in new]
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # another process may have signed the same verses meanwhile (same signature)
+        conn.executemany("INSERT OR IGNORE INTO dedup VALUES (?, ?, ?)", rows)
+        stored = conn.execute("SELECT verse_id, sig FROM dedup ORDER BY verse_id").fetchall()
+        ids = [r["verse_id"] for r in stored]
+        sigs = [np.frombuffer(r["sig"], dtype=np.uint32) for r in stored]
+        cluster_of = dedup.clusters(ids, sigs)
+        conn.executemany("UPDATE dedup SET cluster_id = ? WHERE verse_id = ?",
+                         [(c, i) for i, c in cluster_of.items()])
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(set(cluster_of.values()))
+
+
+def ingest(folder=VERSES_DIR, force=False) -> list[str]:
+    """
+    Ingest new / changed quote files of folder and forget deleted ones,
+    then recluster near-duplicates; returns the names of the files read
+    or forgotten.
+    """
+    conn = _db()
+    known = {r["file"]: (r["size"], r["mtime_ns"]) for r in conn.execute("SELECT * FROM sources")}
+    if known and conn.execute("SELECT 1 FROM origins LIMIT 1").fetchone() is None:
+        force = True                # corpus from before origins: record them once
+    done = []
+    for path in sorted(Path(folder).iterdir()):
+        if path.suffix.lower() not in json_handler.QUOTE_SUFFIXES:
+            continue
+        st = path.stat()
+        if force or known.get(path.name) != (st.st_size, st.st_mtime_ns):
+            ingest_file(path, conn)
+            done.append(path.name)
+        known.pop(path.name, None)
+    for name in known:              # left: files no longer in folder
+        forget_file(name, conn)
+        done.append(name)
+    if done:
+        recluster(conn)
+    return done
+
+
+def ensure(folder=VERSES_DIR):
+    """Incremental ingest before every query (a few stat() calls when nothing changed)."""
+    with _lock:
+        ingest(folder)
+
+
+# ---------- QUERIES -----------------------------------------------
+def topics() -> list[dict]:
+    ensure()
+    rows = _db().execute("SELECT topic, COUNT(*) AS n FROM tags GROUP BY topic ORDER BY topic")
+    return [{"topic": r["topic"], "verses": r["n"]} for r in rows]
+
+
+def _where(topic, min_len, max_len, translation):
+    sql, args = [], []
+    if topic and topic != ALL_TOPICS:
+        sql.append("id IN (SELECT verse_id FROM tags WHERE topic = ?)")
+        args.append(topic)
+    if min_len is not None:
+        sql.append("length >= ?")
+        args.append(min_len)
+    if max_len is not None:
+        sql.append("length <= ?")
+        args.append(max_len)
+    if translation:
+        sql.append("translation = ?")
+        args.append(translation)
+    return (" WHERE " + " AND ".join(sql)) if sql else "", args
+
+
+def count(topic=None, min_len=None, max_len=None, translation=None) -> int:
+    ensure()
+    where, args = _where(topic, min_len, max_len, translation)
+    return _db().execute(f"SELECT COUNT(*) FROM verses{where}", args).fetchone()[0]
+
+
+def sample(n, topic=None, min_len=None, max_len=None, translation=None, rng=random,
+           distinct=True, avoid=None):
+    """
+    n random verses (n = -1 → every match, shuffled) as sqlite3.Rows with
+    id, verse, reference, translation, length.  Only ids are read to draw
+    the sample; rng defaults to the `random` module, so seeding it makes
+    jobs reproducible.  distinct=True takes at most one verse per
+    near-duplicate cluster; avoid(verse_hash) → True pushes a verse and
+    its near-duplicates to the back, so they are only used once
+    everything else has been.
+    """
+    ensure()
+    conn = _db()
+    where, args = _where(topic, min_len, max_len, translation)
+    candidates = conn.execute(
+        f"SELECT id, COALESCE(cluster_id, id), hash FROM verses LEFT JOIN dedup ON verse_id = id"
+        f"{where} ORDER BY id", args).fetchall()
+
+    order = rng.sample(candidates, len(candidates))
+    if avoid is not None:
+        # a verse counts as used when any near-duplicate of it was
+        used = {cluster for _, cluster, h in candidates if avoid(h)}
+        order = ([c for c in order if c[1] not in used] +
+                 [c for c in order if c[1] in used])
+
+    seen, picked = set(), []
+    for vid, cluster, _ in order:
+        if len(picked) == n:
+            break
+        if distinct:
+            if cluster in seen:
+                continue
+            seen.add(cluster)
+        picked.append(vid)
+
+    rows = {}
+    for i in range(0, len(picked), 500):            # SQLite variable limit
+        chunk = picked[i:i + 500]
+        rows.update((r["id"], r) for r in conn.execute(
+            "SELECT id, verse, reference, translation, length FROM verses "
+            f"WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+    return [rows[i] for i in picked]
+
+
+def get_data(topic=None, n=-1, min_len=None, max_len=None, translation=None, avoid=None):
+    """json_handler.get_data() shape – (verses, refs) – from the corpus."""
+    rows = sample(n, topic, min_len, max_len, translation, avoid=avoid)
+    return [r["verse"] for r in rows], [r["reference"] for r in rows]
+
+
+if __name__ == "__main__":
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else VERSES_DIR
+    changed = ingest(folder, force=True)
+    n_clusters = _db().execute("SELECT COUNT(DISTINCT cluster_id) FROM dedup").fetchone()[0]
+    print(f"ingested {len(changed)} file(s) into {storage.CACHE_DIR / DB_NAME}: "
+          f"{count()} distinct verses in {n_clusters} near-duplicate cluster(s)")
+    for t in topics():
+        print(f"  {t['topic']:<18} {t['verses']:>4}")
@@ -0,0 +1,74 @@
+# ── dedup.py ─────────────────────────────────────────────────
+"""
+Near-duplicate detection for short texts: shingling + MinHash + LSH.
+
+• Shingles are character 5-grams of the normalised text (corpus.normalize),
+  so punctuation, quotes and case never matter and small wording changes
+  only touch a few shingles.
+• signature(): NUM_PERM min-hashes, h_i(x) = (a_i·x + b_i) mod (2^31 − 1)
+  over CRC-32 shingle hashes – vectorised, stable across processes.
+• clusters(): signatures are cut into BANDS bands of ROWS rows; texts
+  sharing any band bucket are candidates, confirmed when their estimated
+  Jaccard similarity ≥ THRESHOLD, and joined with union-find.  Each bucket
+  is compared against its first member only, so the work is linear in the
+  number of texts × bands instead of quadratic.
+"""
+import zlib
+
+import numpy as np
+
+SHINGLE   = 5
+NUM_PERM  = 64
+BANDS     = 16
+ROWS      = NUM_PERM // BANDS      # 4 → candidate S-curve midpoint ≈ 0.5
+THRESHOLD = 0.6                    # estimated Jaccard to call two texts duplicates
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(0x5EED)          # fixed: signatures are stored
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(normalized: str) -> set[str]:
+    if len(normalized) <= SHINGLE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE] for i in range(len(normalized) - SHINGLE + 1)}
+
+
+def signature(normalized: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32) of a normalised text."""
+    hv = np.fromiter((zlib.crc32(s.encode()) % _PRIME for s in shingles(normalized)),
+                     dtype=np.uint64)
+    # a, x < 2^31 → a·x + b < 2^63: no uint64 overflow
+    return ((np.outer(hv, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+def clusters(ids, sigs) -> dict:
+    """
+    {id: cluster id} for parallel lists of ids and signatures; a cluster
+    is named after its smallest id, singletons map to themselves.
+    """
+    parent = {i: i for i in ids}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    sig_of = dict(zip(ids, sigs))
+    for band in range(BANDS):
+        lo, hi = band * ROWS, (band + 1) * ROWS
+        buckets = {}
+        for i, sig in zip(ids, sigs):
+            first = buckets.setdefault(sig[lo:hi].tobytes(), i)
+            if first != i and find(first) != find(i) \
+                    and similarity(sig_of[first], sig) >= THRESHOLD:
+                a, b = find(first), find(i)
+                parent[max(a, b)] = min(a, b)
+    return {i: find(i) for i in ids}
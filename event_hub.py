@@ -0,0 +1,110 @@
+# ── event_hub.py ─────────────────────────────────────────────
+"""
+Job events for the web process: ONE Redis pub/sub subscription per
+process, fanned out to any number of listeners.
+
+• Workers publish {"job_id", "status", ...} on videobot.progress.CHANNEL
+  (state changes, throttled encode progress, done / error).
+• The hub subscribes lazily, on the first listener, and a single pump
+  task hands every message to the asyncio.Queue of each listener that
+  watches its job – a thousand open /events streams still cost one
+  Redis connection.
+• `async with hub.listen(ids)` returns once the subscription is
+  confirmed by Redis: whatever a listener reads after that (e.g. the
+  current job status) can't miss a later event.
+• A listener that falls behind loses its oldest queued events, never
+  the pump's time; a dropped Redis connection is re-subscribed (events
+  published meanwhile are lost – listeners re-read status on idle).
+"""
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import redis
+import redis.asyncio as aioredis
+
+QUEUE_SIZE = 256          # events buffered per listener
+RETRY      = 1.0          # seconds before re-subscribing after a Redis error
+READY      = 5.0          # seconds listen() waits for the subscription, at most
+
+
+class EventHub:
+    def __init__(self, url: str, channel: str):
+        self.url, self.channel = url, channel
+        self._listeners = defaultdict(set)      # job_id → {asyncio.Queue}
+        self._pump = None
+        self._redis = None
+        self._ready = asyncio.Event()           # set while subscribed
+        self.enabled = url.startswith(("redis://", "rediss://"))   # no pub/sub elsewhere
+
+    # ---------- listeners ----------------------------------------
+    @asynccontextmanager
+    async def listen(self, job_ids):
+        """
+        `async with hub.listen(ids) as queue:` – events of those jobs, as
+        dicts, from the moment the body starts (or after READY s without
+        Redis, or never on a non-Redis backend: the listener has to catch
+        up by polling).
+        """
+        queue = asyncio.Queue(QUEUE_SIZE)
+        for job_id in job_ids:
+            self._listeners[job_id].add(queue)
+        try:
+            if self.enabled:
+                self._ensure()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), READY)
+                except asyncio.TimeoutError:
+                    pass
+            yield queue
+        finally:
+            for job_id in job_ids:
+                self._listeners[job_id].discard(queue)
+                if not self._listeners[job_id]:
+                    del self._listeners[job_id]
+
+    def _deliver(self, event: dict):
+        for queue in self._listeners.get(event.get("job_id"), ()):
+            if queue.full():            # slow client: drop its oldest event
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    # ---------- the one subscription -----------------------------
+    def _ensure(self):
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        self._redis = self._redis or aioredis.from_url(self.url)
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":      # the server's confirmation
+                        self._ready.set()
+                        continue
+                    try:
+                        self._deliver(json.loads(message["data"]))
+                    except ValueError:
+                        continue
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                print(f"\033[0;33mevent hub: {e}, re-subscribing\033[0m")
+                self._ready.clear()
+                await asyncio.sleep(RETRY)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
+            try:
+                await self._pump
+            except asyncio.CancelledError:
+                pass
+            self._pump = None
+            self._ready.clear()
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
@@ -3,14 +3,26 @@ import os
 import pickle
 import random
 import subprocess
-import shlex          # ← NEW
-import re
 import sys
 import time
 import json_handler
+import corpus
+import history
 import verse_handler
+import media_probe
+import proxies
+import audio_beds
+import compositor
+import render_cache
+import prerender
+import pipeline
 import Fonts
 import cv2
+from collections import Counter
+
+
+# encoder settings shared by every render (also part of the render-cache key)
+ENCODER = {"fps": 24, "vcodec": "libx264", "preset": "veryfast", "crf": 18}
 
 
 def create_dirs(output_folder, customer_name, posts=True):
@@ -21,74 +33,324 @@ def create_dirs(output_folder, customer_name, posts=True):
     return output_path
 
 
-def create_videos(video_folder, audio_folder, json_file, fonts_dir, output_folder,
-                  text_source_font, image_file, customer_name, number_of_videos,
-                  fonts: Fonts, posts=False):
+def cpu_budget() -> int:
+    """
+    Cores this worker may use: VIDEOBOT_CPUS → cgroup quota → CPU affinity.
+    """
+    env = os.getenv("VIDEOBOT_CPUS")
+    if env:
+        return max(1, int(env))
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
 
-    verses, refs = json_handler.get_data(json_file)
-    if number_of_videos == -1:
-        number_of_videos = len(verses) - 1
 
-    start_time_total = time.time()
-    videos_num, audios_num, fonts_num = [], [], []
+def split_threads(workers, jobs, cpus=None):
+    """
+    Return (parallel encodes, -threads per encode) so that the product
+    never exceeds the CPU budget.  workers=None picks ~4 threads/encode,
+    which is where libx264 at 1080p stops scaling linearly.
+    """
+    cpus = cpus or cpu_budget()
+    if workers is None:
+        workers = int(os.getenv("VIDEOBOT_RENDER_WORKERS", 0)) or cpus // 4
+    workers = max(1, min(workers, jobs, cpus))
+    return workers, max(1, cpus // workers)
+
+
+ENCODE_MEM_MB = 200   # rough peak RSS of one 1080x1920 libx264 veryfast output
+
 
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def max_group_size(workers, threads=None):
+    """
+    How many outputs one ffmpeg process may write from a single decode.
+    Each output is its own libx264 encoder, so it needs at least one of
+    the slot's threads and ~ENCODE_MEM_MB of this worker's share of RAM.
+    threads=None leaves the thread bound to whoever runs the encode.
+    """
+    limit = int(os.getenv("VIDEOBOT_MAX_GROUP", 4))
+    mem = available_memory_mb()
+    if mem:
+        limit = min(limit, mem // workers // ENCODE_MEM_MB)
+    return max(1, min(limit, threads) if threads else limit)
+
+
+COMBO_TRIES = 8   # random alternatives tried per video before accepting a repeat
+
+
+def pop_slot(lists, ok):
+    """
+    Pop one entry from each list – the last ones, as the shuffled rotation
+    always did, unless ok(*entries) rejects them; then up to COMBO_TRIES
+    random alternatives are tried.
+    """
+    choice = [len(lst) - 1 for lst in lists]
+    if not ok(*(lst[c] for lst, c in zip(lists, choice))):
+        for _ in range(COMBO_TRIES):
+            alt = [random.randrange(len(lst)) for lst in lists]
+            if ok(*(lst[c] for lst, c in zip(lists, alt))):
+                choice = alt
+                break
+    for lst, c in zip(lists, choice):
+        lst[c], lst[-1] = lst[-1], lst[c]
+    return [lst.pop() for lst in lists]
+
+
+def select_verses(json_file, number_of_videos, topic=None, min_len=None, max_len=None,
+                  translation=corpus.DEFAULT_TRANSLATION, hist=None):
+    """(verses, refs, number_of_videos) for a job – see create_videos."""
+    if topic:
+        avoid = (lambda h: hist.seen_verse(verse_hash=h)) if hist else None
+        verses, refs = corpus.get_data(topic, number_of_videos, min_len, max_len, translation,
+                                       avoid=avoid)
+        if number_of_videos == -1 or number_of_videos > len(verses):
+            if number_of_videos != -1:
+                print(f"\033[0;33mOnly {len(verses)} verse(s) match topic {topic!r}\033[0m")
+            number_of_videos = len(verses)
+    else:
+        # only the first number_of_videos quotes are read (.json, .ndjson or .csv)
+        verses, refs = json_handler.get_data(
+            json_file, None if number_of_videos == -1 else number_of_videos,
+            avoid=hist.seen_verse if hist else None)
+        if number_of_videos == -1:
+            number_of_videos = len(verses) - 1
+    return verses, refs, number_of_videos
+
+
+def list_media(video_folder, audio_folder):
     video_files = [f"{video_folder}/{f}" for f in os.listdir(video_folder) if f.endswith(".mp4")]
     audio_files = [f"{audio_folder}/{f}" for f in os.listdir(audio_folder) if f.endswith(".mp3")]
+    media_probe.warm(video_files + audio_files)   # no-op once the cache is hot
+    return video_files, audio_files
+
+
+def assign_slots(number_of_videos, n_videos, n_audios, n_fonts):
+    """Shuffled rotations (from random offsets) of background / audio / font indices."""
+    slots = []
+    for n in (n_videos, n_audios, n_fonts):
+        start = random.randint(0, n - 1)
+        nums = [(start + i) % n for i in range(number_of_videos)]
+        random.shuffle(nums)
+        slots.append(nums)
+    return slots
+
+
+def plan_jobs(verses, refs, slots, video_files, audio_files, fonts, hist=None):
+    """
+    Yield one job dict per video, in order (plain data: it also travels
+    as a Celery argument).  Consumes slots.
+    """
+    videos_num, audios_num, fonts_num = slots
+    for i in range(len(videos_num)):
+        text_verse, text_source = verses[i], refs[i]
+
+        def fresh(v, a, f):
+            return hist is None or not hist.seen_combo(
+                text_verse, video_files[v], audio_files[a], fonts[f].path)
+
+        v, a, f = pop_slot([videos_num, audios_num, fonts_num], fresh)
+        video_file, audio_file = video_files[v], audio_files[a]
+        font_file, font_size, font_chars = fonts[f]
+        if hist is not None:
+            hist.record(text_verse, video_file, audio_file, font_file)
+        src_img  = text_source.replace(":", "").rstrip()
+        src_name = src_img.replace(" ", "")
+        file_name = f"/{i}-{src_name}_{os.path.basename(video_file).split('.')[0]}.mp4"
 
-    random_for_video = random.randint(0, len(video_files) - 1)
-    random_for_audio = random.randint(0, len(audio_files) - 1)
-    random_for_font  = random.randint(0, len(fonts.fonts_path) - 1)
+        yield {"index": i, "file_name": file_name, "src_img": src_img,
+               "text_source": text_source, "text_verse": text_verse,
+               "video_file": video_file, "audio_file": audio_file,
+               "font": [font_file, font_size, font_chars]}
+
+
+def verse_card(job, autofit=False) -> tuple:
+    """
+    The verse card of one planned job as prerender.VerseJob fields:
+    probes the background for the canvas and, with autofit, fits the size.
+    """
+    font_file, font_size, font_chars = job["font"]
+    meta = media_probe.probe(proxies.resolve(job["video_file"]))
+    frame = (meta["width"], meta["height"])
+    if autofit:
+        font_size = verse_handler.fit_font_size(job["text_verse"], font_file, frame)
+    return job["text_verse"], font_file, font_size, font_chars, (frame[0], frame[1] // 2)
+
+
+def prepare_job(job, text_source_font, image_file, output_path,
+                composite=None, autofit=False, posts=False, card=None):
+    """
+    Probe, render the verse card and build the render spec of one planned
+    job; sets job["font_size"].  card = (verse_card(job), future) when the
+    card was already submitted to a verse pool (prerender.submit): only
+    waits for it.  Returns the spec, or None when the render cache already
+    placed the video.
+    """
+    if card is None:
+        fields = verse_card(job, autofit)
+    else:
+        fields, future = card
+        prerender.wait(future)
+    font_file, font_size, font_chars = fields[1:4]
+
+    spec = prepare_render(
+        job["text_verse"], job["text_source"], text_source_font, job["src_img"],
+        job["video_file"], job["audio_file"], image_file,
+        font_file, font_size, font_chars,
+        output_path, job["file_name"], composite
+    )
+    job["font_size"] = spec["font_size"]
+    spec["index"] = job["index"]
+    spec["cache_key"] = render_cache.key_for(spec, ENCODER)
+    # identical renders from earlier jobs / customers are linked, not encoded
+    if render_cache.fetch(spec["cache_key"], spec["out_path"]):
+        print(f"\033[0;34m Video #{job['index']} served from render cache\033[0m")
+        if posts:
+            verse_handler.create_post_images(spec["out_path"], f"{output_path}/post_images")
+        return None
+    return spec
+
+
+def encode_unit(unit, threads, posts=False, progress=None):
+    """
+    Encode 1..N specs sharing a background with one ffmpeg, then cache
+    them; progress(stats) gets live numbers (see encode_video).
+    """
+    t0 = time.time()
+    label = ", ".join(f"#{spec['index']}" for spec in unit)
+    print(f"Creating Video {label}")
+    encode_video(build_ffmpeg_cmd(unit, threads), [spec["out_path"] for spec in unit], posts,
+                 progress, max(spec["duration"] for spec in unit))
+    for spec in unit:
+        render_cache.store(spec["cache_key"], spec["out_path"])
+    print(f"\033[0;34m DONE {label}, Run time:", round(time.time()-t0,2),"s\033[0m",
+          os.path.dirname(unit[0]["out_path"]))
+
+
+def write_manifest(jobs, output_path, customer_name, autofit=False):
+    """The customer CSV, in plan order (font sizes only for auto-fit jobs)."""
+    jobs = sorted(jobs, key=lambda j: j["index"])
+    verse_handler.add_sheets([j["file_name"].strip("/") for j in jobs], output_path, customer_name,
+                             [j["text_source"] for j in jobs], [j["text_verse"] for j in jobs],
+                             [j["font_size"] for j in jobs] if autofit else None)
 
-    for i in range(number_of_videos):
-        videos_num.append((random_for_video + i) % len(video_files))
-        audios_num.append((random_for_audio + i) % len(audio_files))
-        fonts_num.append((random_for_font  + i) % len(fonts.fonts_path))
 
-    random.shuffle(videos_num)
-    random.shuffle(audios_num)
-    random.shuffle(fonts_num)
+def create_videos(video_folder, audio_folder, json_file, fonts_dir, output_folder,
+                  text_source_font, image_file, customer_name, number_of_videos,
+                  fonts: Fonts.Fonts, posts=False, workers=None, composite=None,
+                  autofit=False, topic=None, min_len=None, max_len=None,
+                  translation=corpus.DEFAULT_TRANSLATION, avoid_repeats=True):
+    """
+    topic=None reads json_file in order (legacy layout, NDJSON or CSV); a topic (or corpus.ALL_TOPICS)
+    draws random verses from the corpus instead, optionally limited to
+    min_len..max_len characters.
+    avoid_repeats=True consults the customer's history (history.py): verses
+    they already got are used last, and a (verse, background, audio, font)
+    combo they already got is swapped for another slot when possible.
+    """
+    hist = history.History(customer_name) if avoid_repeats else None
+    verses, refs, number_of_videos = select_verses(
+        json_file, number_of_videos, topic, min_len, max_len, translation, hist)
+
+    start_time_total = time.time()
+    video_files, audio_files = list_media(video_folder, audio_folder)
+    slots = assign_slots(number_of_videos, len(video_files), len(audio_files), len(fonts))
 
     output_path = create_dirs(output_folder, customer_name, posts)
 
-    col1 = col2 = col3 = []
     avg_runtime = get_avg_runtime("runtime.pk")
     if avg_runtime != -1:
         est = round(avg_runtime * number_of_videos, 2)
         print("\033[0;32mEstimated run time:", est, "seconds\033[0m")
 
-    for i in range(number_of_videos):
-        t0 = time.time()
-        print(f"Creating Video #{i}")
-
-        video_file = video_files[videos_num.pop()]
-        audio_file = audio_files[audios_num.pop()]
-
-        rnd_font = fonts_num.pop()
-        font_file, font_size, font_chars = (
-            fonts.fonts_path[rnd_font],
-            fonts.fonts_size[rnd_font],
-            fonts.fonts_chars_limit[rnd_font],
-        )
-
-        text_verse, text_source = verses[i], refs[i]
-        src_img  = text_source.replace(":", "").rstrip()
-        src_name = src_img.replace(" ", "")
-        file_name = f"/{i}-{src_name}_{os.path.basename(video_file).split('.')[0]}.mp4"
-
-        create_video(
-            text_verse, text_source, text_source_font, src_img,
-            video_file, audio_file, image_file,
-            font_file, font_size, font_chars,
-            output_path, file_name, posts
-        )
-
-        col1.append(file_name.strip("/"))
-        col2.append(text_source)
-        col3.append(text_verse)
-
-        print(f"\033[0;34m DONE #{i}, Run time:", round(time.time()-t0,2),"s\033[0m", output_path)
+    # encoder slots: videos sharing a background become one ffmpeg run (unit),
+    # so size the split on the expected number of units
+    workers, threads = split_threads(workers, number_of_videos)
+    group_size = max_group_size(workers, threads)
+    per_bg = Counter(slots[0])
+    workers, threads = split_threads(
+        workers, sum(-(-n // group_size) for n in per_bg.values()))
+    cpus = cpu_budget()
+
+    jobs = []                                   # plan order → CSV + file names
+
+    cards = {}                                  # index → (verse_card, future)
+
+    # stage 1: plan assignments in order; every verse card of the plan goes
+    # to the verse pool right away, so all its processes render while the
+    # first videos are prepared and encoded
+    def plan():
+        jobs.extend(plan_jobs(verses, refs, slots, video_files, audio_files, fonts, hist))
+        for job in jobs:
+            card = verse_card(job, autofit)
+            cards[job["index"]] = (card, prerender.submit(verse_pool, card))
+        yield from jobs
+
+    # stage 2: wait for the job's verse card, build the spec
+    def prepare(job, emit):
+        spec = prepare_job(job, text_source_font, image_file, output_path,
+                           composite, autofit, posts, cards.pop(job["index"]))
+        if spec is not None:
+            emit(spec)
+
+    # stage 2b: verses sharing a background are written by one ffmpeg from one
+    # decode; a partial group goes out early whenever an encoder is waiting
+    pending = {}
+
+    def first_index(key):
+        return min(spec["index"] for spec in pending[key])
+
+    def release(key, emit):
+        emit(sorted(pending.pop(key), key=lambda spec: spec["index"]))
+
+    def group(spec, emit):
+        key = (spec["video_file"], spec["logo"], spec["loop_logo"])
+        pending.setdefault(key, []).append(spec)
+        if len(pending[key]) >= group_size:
+            release(key, emit)
+        elif encode_stage.hungry():
+            release(min(pending, key=first_index), emit)
+
+    def flush(emit):
+        for key in sorted(pending, key=first_index):
+            release(key, emit)
+
+    # stage 3: encode N units at a time
+    def encode(unit, emit):
+        encode_unit(unit, threads, posts)
+
+    print(f"Rendering {number_of_videos} video(s): {workers} encode(s) in parallel "
+          f"x {threads} thread(s), up to {group_size} output(s) per ffmpeg run")
+    encode_stage = pipeline.Stage("encode", encode, workers, maxsize=workers)
+    pipe = pipeline.Pipeline(
+        pipeline.Stage("prepare", prepare, min(cpus, 4), maxsize=2 * min(cpus, 4)),
+        pipeline.Stage("group", group, 1, maxsize=2 * group_size * workers, finish=flush),
+        encode_stage,
+    )
+    with prerender.executor(cpus) as verse_pool:
+        pipe.run(plan(), "plan")
+    pipe.print_report()
+    if hist is not None:
+        hist.commit()                           # only once every video exists
 
-    verse_handler.add_sheets(col1, output_path, customer_name, col2, col3)
+    write_manifest(jobs, output_path, customer_name, autofit)
 
     if number_of_videos > 1:
         new_avg = (avg_runtime + (time.time()-start_time_total)/number_of_videos)/2
@@ -98,44 +360,205 @@ def create_videos(video_folder, audio_folder, json_file, fonts_dir, output_folde
 def create_video(text_verse, text_source, text_source_font, src_img,
                  video_file, audio_file, image_file,
                  font_file, font_size, font_chars,
-                 output_path, file_name, posts=True):
+                 output_path, file_name, posts=True, threads=0, composite=None):
+
+    cmd = prepare_video(
+        text_verse, text_source, text_source_font, src_img,
+        video_file, audio_file, image_file,
+        font_file, font_size, font_chars,
+        output_path, file_name, threads, composite
+    )
+    encode_video(cmd, f"{output_path}{file_name}", posts)
+
+
+def prepare_video(text_verse, text_source, text_source_font, src_img,
+                  video_file, audio_file, image_file,
+                  font_file, font_size, font_chars,
+                  output_path, file_name, threads=0, composite=None):
+    """Probe the background, render the verse PNG and return the ffmpeg argv."""
+    spec = prepare_render(
+        text_verse, text_source, text_source_font, src_img,
+        video_file, audio_file, image_file,
+        font_file, font_size, font_chars,
+        output_path, file_name, composite
+    )
+    return build_ffmpeg_cmd([spec], threads)
+
+
+def prepare_render(text_verse, text_source, text_source_font, src_img,
+                   video_file, audio_file, image_file,
+                   font_file, font_size, font_chars,
+                   output_path, file_name, composite=None, autofit=False):
+    """
+    Probe the background, render the text PNGs and return a render spec:
+    everything build_ffmpeg_cmd needs to write this one output.
+    autofit=True replaces font_size by the largest size that fits the box.
+    """
+    video_file = proxies.resolve(video_file)   # pre-normalized copy when one is built
+    meta = media_probe.probe(video_file)
+    w, h, vid_dur = meta["width"], meta["height"], meta["duration"]
 
-    result = subprocess.run(
-        ["ffprobe", "-v", "error", "-show_entries", "stream=width,height",
-         "-of", "csv=p=0:s=x", video_file],
-        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    w, h = map(int, re.findall(r"\d+", result.stdout.decode())[:2])
+    # AAC bed → stream copy; raw MP3 → encode as before
+    bed = audio_beds.resolve(audio_file, vid_dur)
+    audio_in, audio_codec = (bed, "copy") if bed else (audio_file, "aac")
 
-    vid_dur = float(subprocess.check_output(
-        shlex.split(f'ffprobe -i "{video_file}" -show_entries format=duration -v quiet -of csv="p=0"')
-    ).decode().strip())
+    if autofit:
+        font_size = verse_handler.fit_font_size(text_verse, font_file, (w, h))
 
     verse_img, verse_h = verse_handler.create_image(
         text_verse, font_file, font_size, font_chars,
         (w, h//2), output_path, src_img, text_color=(255,255,255,255))
 
-    img_y, ref_y, txt_y = 0, 800, 800 + verse_h + 75
-    if txt_y > 1200:
-        diff = txt_y - 1200
-        txt_y, ref_y = 1200, ref_y - diff
-
-    text_source = text_source.replace(":", "\\:")
-    out_path = f"{output_path}{file_name}"
-
-    ffmpeg_cmd = (
-        f'ffmpeg -loglevel error -stats -y -loop 1 -i "{image_file}" -i "{audio_file}" '
-        f'-i "{video_file}" -i "{verse_img}" -r 24 -filter_complex '
-        f'"[2:v][0:v]overlay=(W-w)/2:{img_y}[v1]; '
-        f'[v1]drawtext=fontfile=\'{text_source_font}\':text=\'{text_source}\':'
-        f'x=(w-text_w)/2:y={txt_y}:fontsize=42:fontcolor=white:enable=\'between(t,1,{vid_dur})\'[v2]; '
-        f'[v2][3:v]overlay=(W-w)/2:{ref_y}:enable=\'between(t,1,{vid_dur})\'[v3]" '
-        f'-t {vid_dur} -map "[v3]" -map 1 -c:v libx264 -preset veryfast -crf 18 "{out_path}"'
-    )
-
-    subprocess.check_call(shlex.split(ffmpeg_cmd))   # ← FIXED
+    img_y = 0
+    ref_y = verse_handler.VERSE_Y
+    txt_y = ref_y + verse_h + verse_handler.REF_GAP
+    if txt_y > verse_handler.REF_MAX_Y:
+        diff = txt_y - verse_handler.REF_MAX_Y
+        txt_y, ref_y = verse_handler.REF_MAX_Y, ref_y - diff
+
+    if composite is None:
+        composite = compositor.COMPOSITE_OVERLAY
+
+    ref_img = compositor.reference_sprite(text_source, text_source_font)
+
+    if composite:
+        # reference + verse pre-painted into one layer → a single gated overlay;
+        # the logo is a still, overlay repeats its only frame (no -loop decode)
+        layer, layer_x, layer_y = compositor.compose_text_layer(
+            verse_img, ref_img, w, ref_y, txt_y)
+        layers = [(layer, layer_x, layer_y)]
+    else:
+        layers = [(ref_img, "(W-w)/2", txt_y), (verse_img, "(W-w)/2", ref_y)]
+
+    return {
+        "video_file":  video_file,
+        "duration":    vid_dur,
+        "logo":        image_file,
+        "logo_y":      img_y,
+        "loop_logo":   not composite,
+        "audio":       audio_in,
+        "audio_codec": audio_codec,
+        "layers":      layers,          # (png, x, y), shown from t=1
+        "font_size":   font_size,
+        "out_path":    f"{output_path}{file_name}",
+    }
+
+
+def build_ffmpeg_cmd(specs, threads=0):
+    """
+    One ffmpeg argv for 1..N specs that share background and logo.  The
+    clip is decoded and logo-overlaid once, then `split` feeds one overlay
+    chain + libx264 encoder per output; `threads` is shared between them.
+    """
+    first, n = specs[0], len(specs)
+    enc_threads = max(1, threads // n) if threads else 0
+
+    cmd = ["ffmpeg", "-loglevel", "error", "-stats", "-y"]
+    if threads:
+        # cap both the filter graph and libx264 so parallel encodes don't oversubscribe
+        cmd += ["-filter_complex_threads", str(threads)]
+    cmd += ["-i", first["video_file"]]
+    cmd += (["-loop", "1"] if first["loop_logo"] else []) + ["-i", first["logo"]]
+
+    graph = [f"[0:v][1:v]overlay=(W-w)/2:{first['logo_y']}[base]"]
+    if n > 1:
+        graph.append(f"[base]split={n}" + "".join(f"[b{k}]" for k in range(n)))
+
+    next_input, outputs = 2, []
+    for k, spec in enumerate(specs):
+        audio_idx = next_input
+        cmd += ["-i", spec["audio"]]
+        next_input += 1
+
+        label = "base" if n == 1 else f"b{k}"
+        for j, (png, x, y) in enumerate(spec["layers"]):
+            cmd += ["-i", png]
+            graph.append(f"[{label}][{next_input}:v]overlay={x}:{y}:"
+                         f"enable='between(t,1,{spec['duration']})'[v{k}_{j}]")
+            label = f"v{k}_{j}"
+            next_input += 1
+        outputs.append((label, audio_idx, spec))
+
+    cmd += ["-filter_complex", "; ".join(graph)]
+    for label, audio_idx, spec in outputs:
+        cmd += ["-map", f"[{label}]", "-map", f"{audio_idx}:a",
+                "-r", str(ENCODER["fps"]), "-t", str(spec["duration"]),
+                "-c:v", ENCODER["vcodec"], "-preset", ENCODER["preset"], "-crf", str(ENCODER["crf"]),
+                "-c:a", spec["audio_codec"]]
+        if enc_threads:
+            cmd += ["-threads", str(enc_threads)]
+        cmd.append(spec["out_path"])
+    return cmd
+
+
+def parse_progress(lines, duration):
+    """
+    Yield one stats dict per block of ffmpeg's `-progress` key=value
+    stream: out_time (s), fps, speed (× realtime) and percent of duration.
+    """
+    block = {}
+    for line in lines:
+        k, _, v = line.strip().partition("=")
+        block[k] = v
+        if k != "progress":
+            continue
+        try:
+            out_time = max(0.0, int(block.get("out_time_us", 0)) / 1e6)
+        except ValueError:                      # "N/A" before the first frame
+            out_time = 0.0
+        try:
+            speed = float(block.get("speed", "0").rstrip("x"))
+        except ValueError:
+            speed = 0.0
+        try:
+            fps = float(block.get("fps", 0))
+        except ValueError:
+            fps = 0.0
+        done = v == "end"
+        percent = 100.0 if done else min(99.9, 100 * out_time / duration) if duration else 0.0
+        yield {"out_time": round(out_time, 2), "fps": fps, "speed": speed,
+               "percent": round(percent, 1)}
+        block = {}
+
+
+def run_with_progress(cmd, duration, progress):
+    """
+    Run an ffmpeg argv with `-progress pipe:1` instead of -stats and hand
+    every parsed block to progress(stats).  Errors still go to stderr.
+    """
+    cmd = [a for a in cmd if a != "-stats"]
+    cmd[1:1] = ["-nostats", "-progress", "pipe:1"]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True) as proc:
+        try:
+            for stats in parse_progress(proc.stdout, duration):
+                progress(stats)
+        except BaseException:
+            proc.kill()
+            raise
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def encode_video(cmd, out_paths, posts=False, progress=None, duration=None):
+    """
+    Run one encode.  progress(stats) → live numbers parsed from ffmpeg
+    (see run_with_progress); without it ffmpeg prints -stats as before.
+    """
+    out_paths = [out_paths] if isinstance(out_paths, str) else out_paths
+    for out_path in out_paths:
+        # an old output may be a hard link into the render cache: ffmpeg -y
+        # would truncate that shared inode in place, so unlink it first
+        if os.path.lexists(out_path):
+            os.unlink(out_path)
+
+    if progress is None:
+        subprocess.check_call(cmd)   # ← FIXED
+    else:
+        run_with_progress(cmd, duration, progress)
 
     if posts:
-        verse_handler.create_post_images(out_path, f"{output_path}/post_images")
+        for out_path in out_paths:
+            verse_handler.create_post_images(out_path, f"{os.path.dirname(out_path)}/post_images")
 
 
 def get_avg_runtime(filename):
@@ -0,0 +1,163 @@
+# ── glyph_atlas.py ───────────────────────────────────────────
+"""
+NumPy glyph atlas rasterizer for verse cards.
+
+Each (font, size) gets an atlas in which every glyph is rasterised by
+FreeType once per sub-pixel phase (1/64 px, as FreeType positions it),
+as an alpha mask plus its offset from the pen position.  A verse is then
+composed by blitting those masks into one alpha plane, shifting a copy
+for the drop shadow and blending the two through a (text α, shadow α)
+→ RGBA table – no per-call `draw.text`.
+
+Placement follows Pillow exactly: each line is anchored like
+ImageDraw.text(anchor="mm") – whole-pixel anchor offsets, fractional
+line origin – and the pen keeps its fraction from glyph to glyph, so
+cards match verse_handler.render_verse pixel for pixel (single lines;
+where two lines' ink overlaps, alpha may differ by one level).
+"""
+import threading
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+import Fonts
+import text_layout
+
+SHADOW_OFFSET = (-1, 4)
+TEXT_BG       = (190, 190, 190, 0)     # verse_handler.render_verse's canvas colours
+SHADOW_BG     = (255, 255, 255, 0)
+
+
+def _pixel(x26: int) -> int:
+    """FreeType's PIXEL(): 26.6 fixed point → nearest whole pixel."""
+    return (x26 + 32) >> 6
+
+
+class GlyphAtlas:
+    """Alpha masks of one FontFace, keyed by (character, x phase, y phase)."""
+
+    def __init__(self, face: Fonts.FontFace):
+        self.face = face
+        self.glyphs: dict[tuple[str, int, int], tuple[np.ndarray, int, int]] = {}
+        font = face.font
+        # anchor "mm" vs "la": whole-pixel shift of the line's ascender top
+        self.mid_to_top = font.getbbox("A", anchor="mm")[1] - font.getbbox("A", anchor="la")[1]
+        for ch in Fonts.PRELOAD_CHARS:
+            self.glyph(ch, 0, 0)
+
+    def glyph(self, ch: str, px: int, py: int):
+        """
+        (mask, dx, dy) of ch drawn with its pen at sub-pixel phase
+        (px/64, py/64); mask's top-left relative to (⌊pen x⌋, ⌊ascender top⌋).
+        """
+        key = (ch, px, py)
+        g = self.glyphs.get(key)
+        if g is None:
+            core, (dx, dy) = self.face.font.getmask2(ch, "L", start=(px / 64, py / 64), anchor="la")
+            if core.size[0] and core.size[1]:
+                mask = np.asarray(Image.frombytes("L", core.size, bytes(core)))
+            else:
+                mask = np.zeros((0, 0), np.uint8)
+            g = self.glyphs[key] = (mask, dx, dy)
+        return g
+
+
+_atlases: dict[tuple[str, int], GlyphAtlas] = {}
+_lock = threading.Lock()
+
+
+def get_atlas(font_path, size: int) -> GlyphAtlas:
+    key = (str(font_path), size)
+    atlas = _atlases.get(key)
+    if atlas is None:
+        with _lock:
+            atlas = _atlases.get(key)
+            if atlas is None:
+                atlas = _atlases[key] = GlyphAtlas(Fonts.get_face(font_path, size))
+    return atlas
+
+
+def _place(lines, atlas: GlyphAtlas, cx: float, cy: float):
+    """
+    Yield (mask, x, y) for every inked glyph, laid out exactly like
+    ImageDraw.multiline_text(anchor="mm", align="center").
+    """
+    face = atlas.face
+    top = cy - (len(lines) - 1) * face.line_pitch / 2
+    for k, line in enumerate(lines):
+        # Pillow: per line text((cx, row), anchor="mm"); the anchor offsets
+        # are whole pixels, the fractional origin is kept
+        asc_top = top + k * face.line_pitch + atlas.mid_to_top
+        pen = cx - _pixel(round(face.text_width(line) * 64) // 2)
+        iy, py = int(asc_top // 1), round(asc_top % 1 * 64)
+        for i, ch in enumerate(line):
+            ix = int(pen // 1)
+            mask, dx, dy = atlas.glyph(ch, round((pen - ix) * 64), py)
+            if mask.size:
+                yield mask, ix + dx, iy + dy
+            pen += face.advance(ch)
+            if i + 1 < len(line):
+                pen += face.kern(ch, line[i + 1])
+
+
+def _over(region: np.ndarray, mask: np.ndarray):
+    """Pillow's glyph compositing: mask over region, MULDIV255-rounded."""
+    t = region.astype(np.int32) * (255 - mask) + 128
+    region[...] = mask + ((t + (t >> 8)) >> 8)
+
+
+@lru_cache(maxsize=16)
+def _blend_table(text_color, shadow_color) -> np.ndarray:
+    """
+    "text over shadow" for every (text coverage, shadow coverage) pair: a
+    (65536, 4) uint8 table indexed by t << 8 | s.  Computed by Pillow
+    itself – ink filled through the mask onto the PIL path's canvas
+    colours, then alpha_composite – so edge pixels round the same way.
+    """
+    cov = np.arange(256, dtype=np.uint8)
+    text = Image.new("RGBA", (256, 256), TEXT_BG)
+    text.paste(text_color, mask=Image.fromarray(np.repeat(cov[:, None], 256, axis=1), "L"))
+    shadow = Image.new("RGBA", (256, 256), SHADOW_BG)
+    shadow.paste(shadow_color, mask=Image.fromarray(np.repeat(cov[None, :], 256, axis=0), "L"))
+    return np.asarray(Image.alpha_composite(shadow, text)).reshape(-1, 4)
+
+
+def render_verse(text, font_path, font_size, image_size, max_width,
+                 text_color=(255, 255, 255, 255), shadow_color=(0, 0, 0, 80)) -> Image.Image:
+    """Atlas equivalent of verse_handler.render_verse (cropped to the text ink)."""
+    atlas = get_atlas(font_path, font_size)
+    w, h = image_size
+    lines = text_layout.wrap(text, atlas.face, max_width)
+
+    placed = list(_place(lines, atlas, w / 2, h / 2))
+    if not placed:
+        return Image.new("RGBA", (1, 1), (0, 0, 0, 0))
+
+    # tight canvas: ink bbox + room for the shadow offset
+    sx, sy = SHADOW_OFFSET
+    x0 = min(x for _, x, _ in placed) + min(sx, 0)
+    y0 = min(y for _, _, y in placed) + min(sy, 0)
+    x1 = max(x + m.shape[1] for m, x, _ in placed) + max(sx, 0)
+    y1 = max(y + m.shape[0] for m, _, y in placed) + max(sy, 0)
+
+    alpha = np.zeros((y1 - y0, x1 - x0), np.uint8)
+    for mask, x, y in placed:
+        region = alpha[y - y0:y - y0 + mask.shape[0], x - x0:x - x0 + mask.shape[1]]
+        _over(region, mask)
+
+    shadow = np.zeros_like(alpha)
+    ah, aw = alpha.shape
+    shadow[max(sy, 0):ah + min(sy, 0), max(sx, 0):aw + min(sx, 0)] = \
+        alpha[max(-sy, 0):ah - max(sy, 0), max(-sx, 0):aw - max(sx, 0)]
+
+    # crop to the text's own ink, like the PIL path
+    rows = np.flatnonzero(alpha.any(axis=1))
+    cols = np.flatnonzero(alpha.any(axis=0))
+    crop = np.s_[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+    # one gather per pixel: (text alpha, shadow alpha) → composited RGBA
+    idx = alpha[crop].astype(np.uint16) << 8 | shadow[crop]
+    rgba = _blend_table(tuple(text_color), tuple(shadow_color))[idx]
+    return Image.fromarray(rgba, "RGBA")
+
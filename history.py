@@ -0,0 +1,95 @@
+# ── history.py ───────────────────────────────────────────────
+"""
+Per-customer usage history, so a returning customer gets new verses and
+new (verse, background, audio, font) pairings.
+
+• cache/history.sqlite holds one row per (customer, kind, key); keys are
+  60-bit integers – the normalised verse hash (corpus.verse_hash) or a
+  hash of the whole combo – under a WITHOUT ROWID primary key.
+• A job loads its customer's keys once into two Python sets (one
+  indexed query each), so every planner check is O(1), even with tens
+  of thousands of past videos.
+• record() buffers; commit() writes the job's rows in one transaction
+  once its videos exist.
+"""
+import hashlib
+import os
+
+import corpus
+import storage
+
+DB_NAME = "history.sqlite"
+VERSE, COMBO = "verse", "combo"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS used (
+    customer TEXT    NOT NULL,
+    kind     TEXT    NOT NULL,
+    key      INTEGER NOT NULL,
+    PRIMARY KEY (customer, kind, key)
+) WITHOUT ROWID;
+"""
+
+
+def _db():
+    conn = storage.connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def verse_key(verse_hash: str) -> int:
+    """60-bit key from a corpus.verse_hash() hex digest."""
+    return int(verse_hash[:15], 16)
+
+
+def combo_key(verse_hash: str, video_file, audio_file, font_file) -> int:
+    names = "\0".join([verse_hash] + [os.path.basename(str(p))
+                                      for p in (video_file, audio_file, font_file)])
+    return int(hashlib.sha1(names.encode()).hexdigest()[:15], 16)
+
+
+class History:
+    """One customer's used verses and combos, loaded once per job."""
+
+    def __init__(self, customer: str):
+        self.customer = customer
+        conn = _db()
+        self.verses = self._load(conn, VERSE)
+        self.combos = self._load(conn, COMBO)
+        self._pending = []
+
+    def _load(self, conn, kind) -> set:
+        rows = conn.execute("SELECT key FROM used WHERE customer = ? AND kind = ?",
+                            (self.customer, kind))
+        return {r[0] for r in rows}
+
+    def seen_verse(self, text: str = None, verse_hash: str = None) -> bool:
+        return verse_key(verse_hash or corpus.verse_hash(text)) in self.verses
+
+    def seen_combo(self, text, video_file, audio_file, font_file) -> bool:
+        return combo_key(corpus.verse_hash(text), video_file, audio_file, font_file) in self.combos
+
+    def record(self, text, video_file, audio_file, font_file):
+        h = corpus.verse_hash(text)
+        vk, ck = verse_key(h), combo_key(h, video_file, audio_file, font_file)
+        self.verses.add(vk)
+        self.combos.add(ck)
+        self._pending += [(self.customer, VERSE, vk), (self.customer, COMBO, ck)]
+
+    def commit(self):
+        if not self._pending:
+            return
+        conn = _db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO used VALUES (?, ?, ?)", self._pending)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._pending = []
+
+
+def forget(customer: str):
+    """Drop a customer's history (they start from scratch)."""
+    _db().execute("DELETE FROM used WHERE customer = ?", (customer,))
@@ -1,49 +1,194 @@
+import csv
 import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
 
+# Quote files are read as streams, in constant memory:
+#   .ndjson / .jsonl   one {"verse": ..., "reference": ...} object per line
+#   .json              {"verses": [...], "references": [...]} (legacy layout)
+#   .csv               "Verse" / "Reference" columns (else the first two columns)
+#
+#   python json_handler.py quotes.json quotes.ndjson      # convert, streaming
 
-def get_data(json_file):
-    with open(f'{json_file}', 'r', encoding='utf-8') as f:
-        jsonData = json.load(f)
-    verses: str = jsonData['verses']
-    refs: str = jsonData['references']
-    return verses, refs
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+QUOTE_SUFFIXES = NDJSON_SUFFIXES | {".json", ".csv"}
+CHUNK = 1 << 16
 
+_SKIP = re.compile(r"[\s,]*")
+_decoder = json.JSONDecoder()
+
+
+def _iter_array(f, key, chunk=CHUNK):
+    """Yield the elements of the top-level array f[key] without loading the file."""
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buf = ""
+    while True:
+        m = start.search(buf)
+        if m:
+            pos = m.end()
+            break
+        data = f.read(chunk)
+        if not data:
+            raise ValueError(f"no '{key}' array in {getattr(f, 'name', f)}")
+        buf = buf[-len(key) - 16:] + data       # keep a tail for a key split across reads
+
+    eof = False
+    while True:
+        pos = _SKIP.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            if pos == len(buf):
+                raise ValueError
+            obj, end = _decoder.raw_decode(buf, pos)
+            if end == len(buf) and not eof:     # a number may continue in the next read
+                raise ValueError
+        except ValueError:
+            if eof:
+                raise ValueError(f"truncated '{key}' array in {getattr(f, 'name', f)}")
+            data = f.read(chunk)
+            eof = not data
+            buf, pos = buf[pos:] + data, 0
+            continue
+        yield obj
+        pos = end
+
+
+def iter_legacy(json_file):
+    """(verse, reference) pairs of a {"verses": [...], "references": [...]} file."""
+    with open(json_file, "r", encoding="utf-8") as fv, open(json_file, "r", encoding="utf-8") as fr:
+        # two handles, one per array: neither list is ever held in memory
+        yield from zip(_iter_array(fv, "verses"), _iter_array(fr, "references"), strict=True)
+
+
+def iter_ndjson(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                    yield row["verse"], row["reference"]
+                except (ValueError, KeyError) as e:
+                    raise ValueError(f"{path}:{n}: {e}") from None
+
+
+def iter_csv(path):
+    # utf-8-sig: Excel's "CSV UTF-8" starts with a BOM that would hide the header
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        first = next(reader, [])
+        header = [h.strip().lower() for h in first]
+        verse_col = header.index("verse") if "verse" in header else None
+        ref_col = header.index("reference") if "reference" in header else None
+        # an unnamed column is whichever of 0 / 1 the named one doesn't take
+        if verse_col is None:
+            verse_col = 1 if ref_col == 0 else 0
+        if ref_col is None:
+            ref_col = 1 if verse_col == 0 else 0
+        if first and "verse" not in header and "reference" not in header:
+            yield first[verse_col], first[ref_col]     # headerless: row 0 is a quote
+        for row in reader:
+            if row:
+                yield row[verse_col], row[ref_col]
 
-def fix_json_structure(input_file, output_file):
-    with open(input_file, 'r', encoding='utf-8') as file:
-        data = json.load(file)
 
-    verses = data['verses']
-    references = data['references']
+def iter_quotes(path):
+    """(verse, reference) pairs of any supported quote file, streamed."""
+    suffix = Path(path).suffix.lower()
+    if suffix in NDJSON_SUFFIXES:
+        return iter_ndjson(path)
+    if suffix == ".csv":
+        return iter_csv(path)
+    return iter_legacy(path)
 
-    fixed_data = {'verses': []}
 
-    for i in range(len(verses)):
-        verse = verses[i]
-        reference = references[i]
-        fixed_data['verses'].append({'verse': verse, 'reference': reference})
+def get_data(json_file, limit=None, avoid=None):
+    """
+    (verses, refs) lists of the first `limit` entries.  avoid(verse) → True
+    skips an entry while enough others remain; skipped ones fill up the
+    end only when the file runs out.
+    """
+    fresh, used = [], []
+    for verse, ref in iter_quotes(json_file):
+        if avoid is not None and avoid(verse):
+            if limit is None or len(used) < limit:
+                used.append((verse, ref))
+            continue
+        fresh.append((verse, ref))
+        if limit is not None and len(fresh) == limit:
+            break
+    pairs = (fresh + used)[:limit]
+    return [v for v, _ in pairs], [r for _, r in pairs]
 
-    with open(output_file, 'w', encoding='utf-8') as file:
-        json.dump(fixed_data, file, indent=4, ensure_ascii=False)
+
+# ---------- WRITERS (atomic: tmp file + os.replace) ----------------
+@contextmanager
+def _atomic_write(output_file):
+    tmp = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            yield f
+        os.replace(tmp, output_file)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def write_ndjson(pairs, output_file):
+    n = 0
+    with _atomic_write(output_file) as f:
+        for verse, reference in pairs:
+            f.write(json.dumps({"verse": verse, "reference": reference}, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def to_ndjson(input_file, output_file):
+    """Convert a legacy .json or a .csv quote file to NDJSON, streaming."""
+    return write_ndjson(iter_quotes(input_file), output_file)
+
+
+def _write_array(f, key, items, last):
+    # same text as json.dump(..., indent=4) at nesting level 1
+    f.write(f'    "{key}": [')
+    first = True
+    for item in items:
+        body = json.dumps(item, indent=4, ensure_ascii=False).replace("\n", "\n        ")
+        f.write(("\n" if first else ",\n") + "        " + body)
+        first = False
+    f.write("]" if first else "\n    ]")
+    f.write("\n" if last else ",\n")
+
+
+def fix_json_structure(input_file, output_file):
+    with _atomic_write(output_file) as f:
+        f.write("{\n")
+        _write_array(f, "verses", ({"verse": v, "reference": r} for v, r in iter_legacy(input_file)),
+                     last=True)
+        f.write("}")
 
 
 def restore_json_structure(input_file, output_file):
-    with open(input_file, 'r', encoding='utf-8') as file:
-        data = json.load(file)
+    def field(name):
+        # one streaming pass over the input per output array
+        with open(input_file, "r", encoding="utf-8") as src:
+            for verse_data in _iter_array(src, "verses"):
+                yield verse_data[name]
 
-    verses = []
-    references = []
+    with _atomic_write(output_file) as f:
+        f.write("{\n")
+        _write_array(f, "verses", field("verse"), last=False)
+        _write_array(f, "references", field("reference"), last=True)
+        f.write("}")
 
-    for verse_data in data['verses']:
-        verse = verse_data['verse']
-        reference = verse_data['reference']
-        verses.append(verse)
-        references.append(reference)
 
-    restored_data = {
-        'verses': verses,
-        'references': references
-    }
+if __name__ == "__main__":
+    import sys
 
-    with open(output_file, 'w', encoding='utf-8') as file:
-        json.dump(restored_data, file, indent=4, ensure_ascii=False)
\ No newline at end of file
+    if len(sys.argv) != 3:
+        sys.exit("usage: python json_handler.py <quotes.json|quotes.csv> <out.ndjson>")
+    print(f"{to_ndjson(sys.argv[1], sys.argv[2])} quote(s) written to {sys.argv[2]}")
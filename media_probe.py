@@ -0,0 +1,132 @@
+# ── media_probe.py ───────────────────────────────────────────
+"""
+ffprobe results cached on disk.
+
+Rows are keyed by (path, size, mtime) so an edited or replaced clip is
+re-probed automatically; everything else is answered from SQLite without
+spawning a process.
+"""
+import json
+import os
+import subprocess
+from fractions import Fraction
+from pathlib import Path
+
+import storage
+
+DB_NAME = "media.sqlite"
+
+FIELDS = ("width", "height", "duration", "fps", "codec", "pix_fmt",
+          "audio_codec", "sample_rate", "channels", "audio_bitrate")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path          TEXT PRIMARY KEY,
+    size          INTEGER NOT NULL,
+    mtime_ns      INTEGER NOT NULL,
+    width         INTEGER,
+    height        INTEGER,
+    duration      REAL,
+    fps           REAL,
+    codec         TEXT,
+    pix_fmt       TEXT,
+    audio_codec   TEXT,
+    sample_rate   INTEGER,
+    channels      INTEGER,
+    audio_bitrate INTEGER
+)
+"""
+
+
+def _db():
+    conn = storage.connect(DB_NAME)
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def _rate(value) -> float | None:
+    try:
+        r = Fraction(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return float(r) if r else None
+
+
+def _int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def ffprobe(path: str) -> dict:
+    """Run ffprobe once and return every field in FIELDS."""
+    out = subprocess.check_output(
+        ["ffprobe", "-v", "error", "-of", "json",
+         "-show_entries",
+         "format=duration:stream=codec_type,codec_name,width,height,pix_fmt,"
+         "r_frame_rate,avg_frame_rate,sample_rate,channels,bit_rate",
+         path])
+    data = json.loads(out)
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+    return {
+        "width":         _int(video.get("width")),
+        "height":        _int(video.get("height")),
+        "duration":      float(data.get("format", {}).get("duration", 0) or 0),
+        "fps":           _rate(video.get("avg_frame_rate")) or _rate(video.get("r_frame_rate")),
+        "codec":         video.get("codec_name"),
+        "pix_fmt":       video.get("pix_fmt"),
+        "audio_codec":   audio.get("codec_name"),
+        "sample_rate":   _int(audio.get("sample_rate")),
+        "channels":      _int(audio.get("channels")),
+        "audio_bitrate": _int(audio.get("bit_rate")),
+    }
+
+
+def probe(path: str) -> dict:
+    """Cached ffprobe: only the first call per (path, size, mtime) spawns it."""
+    path = str(Path(path).resolve())
+    st = os.stat(path)
+    conn = _db()
+
+    row = conn.execute(
+        "SELECT * FROM media WHERE path = ? AND size = ? AND mtime_ns = ?",
+        (path, st.st_size, st.st_mtime_ns)).fetchone()
+    if row is not None:
+        return {k: row[k] for k in FIELDS}
+
+    info = ffprobe(path)
+    conn.execute(
+        f"INSERT OR REPLACE INTO media (path, size, mtime_ns, {', '.join(FIELDS)}) "
+        f"VALUES (?, ?, ?, {', '.join('?' * len(FIELDS))})",
+        (path, st.st_size, st.st_mtime_ns, *(info[k] for k in FIELDS)))
+    return info
+
+
+def warm(paths) -> int:
+    """Probe every path that is not cached yet; returns how many were probed."""
+    conn = _db()
+    misses = 0
+    for p in paths:
+        p = str(Path(p).resolve())
+        st = os.stat(p)
+        hit = conn.execute(
+            "SELECT 1 FROM media WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (p, st.st_size, st.st_mtime_ns)).fetchone()
+        if hit is None:
+            probe(p)
+            misses += 1
+    return misses
+
+
+def warm_folders(*folders, exts=(".mp4", ".mp3", ".m4a")) -> int:
+    return warm(f"{d}/{f}" for d in folders for f in os.listdir(d) if f.endswith(exts))
+
+
+if __name__ == "__main__":
+    base = storage.BASE_DIR
+    n = warm_folders(base / "videos", base / "audio")
+    print(f"probed {n} new file(s) into {storage.CACHE_DIR / DB_NAME}")
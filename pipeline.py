@@ -0,0 +1,199 @@
+# ── pipeline.py ──────────────────────────────────────────────
+"""
+Small bounded-queue pipeline: a source iterable feeds a chain of stages,
+each with its own worker threads and a bounded inbox, so a fast stage
+blocks (backpressure) instead of piling up work.
+
+    Pipeline(Stage("prepare", prepare, workers=4, maxsize=8),
+             Stage("encode",  encode,  workers=2, maxsize=2)).run(plan, "plan")
+
+• A stage fn is called as fn(item, emit); emit(x) passes x downstream
+  (any number of times).  finish(emit) runs once after a stage's last
+  item, e.g. to flush a batch.
+• Per stage: items, busy / idle (waiting for input) / blocked (waiting
+  for room downstream) seconds and inbox depth – see report().
+• The first exception aborts every stage and is re-raised by run().
+"""
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class Aborted(Exception):
+    pass
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, maxsize=0, finish=None):
+        self.name, self.fn, self.finish = name, fn, finish
+        self.workers = max(1, workers)
+        self.inbox = queue.Queue(maxsize)
+        self.waiting = 0            # workers currently blocked on an empty inbox
+        self.items = 0
+        self.busy = self.idle = self.blocked = 0.0
+        self.max_depth = self._depth_sum = self._puts = 0
+        self._alive = self.workers
+        self._lock = threading.Lock()
+
+    def hungry(self) -> bool:
+        """A worker is waiting and nothing is queued for it."""
+        return self.waiting > 0 and self.inbox.empty()
+
+    def _sample(self):
+        depth = self.inbox.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_sum += depth
+            self._puts += 1
+
+    def stats(self) -> dict:
+        return {
+            "stage":     self.name,
+            "workers":   self.workers,
+            "items":     self.items,
+            "busy":      round(self.busy, 2),
+            "idle":      round(self.idle, 2),
+            "blocked":   round(self.blocked, 2),
+            "max_depth": self.max_depth,
+            "avg_depth": round(self._depth_sum / self._puts, 2) if self._puts else 0.0,
+            "capacity":  self.inbox.maxsize or None,
+        }
+
+
+class Pipeline:
+    def __init__(self, *stages: Stage):
+        self.stages = list(stages)
+        self.source = Stage("source", None)
+        self._abort = threading.Event()
+        self._error = None
+
+    # ---------- queue ops that give up once the pipeline aborts ----
+    def _put(self, stage: Stage, item):
+        while True:
+            if self._abort.is_set():
+                raise Aborted
+            try:
+                stage.inbox.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        if item is not _DONE:
+            stage._sample()
+
+    def _get(self, stage: Stage):
+        with stage._lock:
+            stage.waiting += 1
+        try:
+            while True:
+                if self._abort.is_set():
+                    raise Aborted
+                try:
+                    return stage.inbox.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        finally:
+            with stage._lock:
+                stage.waiting -= 1
+
+    def _emitter(self, nxt, tally: dict):
+        def emit(item):
+            if nxt is None:
+                return
+            t0 = time.perf_counter()
+            self._put(nxt, item)
+            tally["blocked"] += time.perf_counter() - t0
+        return emit
+
+    def _fail(self, exc):
+        if not isinstance(exc, Aborted) and self._error is None:
+            self._error = exc
+        self._abort.set()
+
+    # ---------- threads ---------------------------------------------
+    @staticmethod
+    def _merge(stage: Stage, tally: dict):
+        with stage._lock:
+            stage.items   += tally["items"]
+            stage.busy    += tally["busy"]
+            stage.idle    += tally["idle"]
+            stage.blocked += tally["blocked"]
+
+    def _feed(self, items):
+        src, first = self.source, self.stages[0]
+        tally = dict(items=0, busy=0.0, idle=0.0, blocked=0.0)
+        emit = self._emitter(first, tally)
+        t0 = time.perf_counter()
+        try:
+            for item in items:
+                emit(item)
+                tally["items"] += 1
+            self._put(first, _DONE)
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            tally["busy"] = time.perf_counter() - t0 - tally["blocked"]
+            self._merge(src, tally)
+
+    def _work(self, k: int):
+        stage = self.stages[k]
+        nxt = self.stages[k + 1] if k + 1 < len(self.stages) else None
+        tally = dict(items=0, busy=0.0, idle=0.0, blocked=0.0)
+        emit = self._emitter(nxt, tally)
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = self._get(stage)
+                tally["idle"] += time.perf_counter() - t0
+                if item is _DONE:
+                    self._put(stage, _DONE)         # release the sibling workers
+                    break
+                t0, b0 = time.perf_counter(), tally["blocked"]
+                stage.fn(item, emit)
+                tally["busy"] += time.perf_counter() - t0 - (tally["blocked"] - b0)
+                tally["items"] += 1
+
+            with stage._lock:
+                stage._alive -= 1
+                last = stage._alive == 0
+            if last:
+                if stage.finish:
+                    t0, b0 = time.perf_counter(), tally["blocked"]
+                    stage.finish(emit)
+                    tally["busy"] += time.perf_counter() - t0 - (tally["blocked"] - b0)
+                if nxt is not None:
+                    self._put(nxt, _DONE)
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            self._merge(stage, tally)
+
+    def run(self, items, source_name="source"):
+        """Push items through every stage; returns report() when all are done."""
+        self.source.name = source_name
+        threads = [threading.Thread(target=self._feed, args=(items,), daemon=True)]
+        for k, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=self._work, args=(k,), daemon=True)
+                        for _ in range(stage.workers)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.wall = time.perf_counter() - t0
+        if self._error is not None:
+            raise self._error
+        return self.report()
+
+    def report(self) -> list[dict]:
+        return [self.source.stats()] + [s.stats() for s in self.stages]
+
+    def print_report(self):
+        print(f"\033[0;36mPipeline ({round(self.wall, 2)} s wall):\033[0m")
+        for s in self.report():
+            inbox = ("" if s["stage"] == self.source.name else
+                     f"  inbox max {s['max_depth']}/{s['capacity'] or '∞'} avg {s['avg_depth']}")
+            print(f"  {s['stage']:<8} x{s['workers']}  items {s['items']:>4}  "
+                  f"busy {s['busy']:>7.2f}s  idle {s['idle']:>7.2f}s  "
+                  f"blocked {s['blocked']:>7.2f}s{inbox}")
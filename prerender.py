@@ -0,0 +1,130 @@
+# ── prerender.py ─────────────────────────────────────────────
+"""
+Batch verse-image pre-render stage.
+
+Takes every verse card a job (or a whole topic file) needs and renders
+the missing ones into cache/verses in a process pool, before any ffmpeg
+runs.  The encode stage then only links cached PNGs.
+
+    python prerender.py sources/verses_data/love_data.json [processes]
+
+• Cards are deduplicated by their verse_handler.verse_key and anything
+  already cached is skipped, so a second run is a no-op.
+• Inside a daemonic process (a Celery prefork child may not fork again)
+  the pool is replaced by threads.
+• executor() / submit() / wait() serve single cards from a shared pool:
+  ffmpeg.create_videos submits every card of its plan up front and each
+  prepare step waits only for its own.
+"""
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+
+import json_handler
+import storage
+import verse_handler
+
+CANVAS = (1080, 960)    # (w, h//2) of the proxy profile – see ffmpeg.prepare_render
+WHITE  = (255, 255, 255, 255)
+
+
+class VerseJob(NamedTuple):
+    text: str
+    font_path: str
+    font_size: int
+    chars_limit: int
+    image_size: tuple = CANVAS
+    text_color: tuple = WHITE
+
+
+def _render(job: VerseJob):
+    key, _, height = verse_handler.cached_verse(*job)
+    return key, height
+
+
+def _render_chunk(jobs):
+    return [_render(job) for job in jobs]
+
+
+def executor(processes=None):
+    """Pool for verse cards: processes, or threads inside a daemonic process."""
+    daemon = multiprocessing.current_process().daemon
+    pool_cls = ThreadPoolExecutor if daemon else ProcessPoolExecutor
+    pool = pool_cls(max_workers=max(1, processes or os.cpu_count() or 1))
+    # fork the children now, before the caller starts threads of its own
+    pool.submit(int).result()
+    return pool
+
+
+def submit(pool, job):
+    """Queue one card on pool; None when it is already cached."""
+    job = VerseJob(*job)
+    key = verse_handler.verse_key(*job)
+    if storage.cache_path("verses", key[:2], f"{key}.png").exists():
+        return None
+    return pool.submit(_render, job)
+
+
+def wait(future):
+    """Block until a submit()ted card is in cache/verses (no-op for None)."""
+    if future is not None:
+        key, height = future.result()
+        verse_handler._heights[key] = height
+
+
+def prerender(jobs, processes=None) -> dict:
+    """
+    Render every VerseJob not yet in cache/verses.
+    Returns {"total", "cached", "rendered", "seconds"}.
+    """
+    t0 = time.time()
+    unique = {}
+    for job in (VerseJob(*j) for j in jobs):
+        unique.setdefault(verse_handler.verse_key(*job), job)
+
+    todo = [job for key, job in unique.items()
+            if not storage.cache_path("verses", key[:2], f"{key}.png").exists()]
+
+    processes = max(1, min(processes or os.cpu_count() or 1, len(todo)))
+    if processes == 1 or len(todo) < 2:
+        results = [_render(job) for job in todo]
+    else:
+        # a few chunks per process: fewer pickles, still balanced
+        size = max(1, len(todo) // (processes * 4))
+        chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+        with executor(processes) as pool:
+            results = [r for chunk in pool.map(_render_chunk, chunks) for r in chunk]
+
+    # children measured the heights; keep them so create_image skips the PNG header
+    verse_handler._heights.update(results)
+    return {"total": len(unique), "cached": len(unique) - len(todo),
+            "rendered": len(todo), "seconds": round(time.time() - t0, 2)}
+
+
+def topic_jobs(json_file, fonts, image_size=CANVAS):
+    """Every verse of a topic file in every font of the rotation."""
+    verses, _ = json_handler.get_data(json_file)
+    return [VerseJob(text, spec.path, spec.size, spec.chars_limit, image_size)
+            for text in verses for spec in fonts.specs]
+
+
+def prerender_topic(json_file, fonts, processes=None, image_size=CANVAS) -> dict:
+    """Pre-warm cache/verses for a whole verses_data/*.json file."""
+    return prerender(topic_jobs(json_file, fonts, image_size), processes)
+
+
+if __name__ == "__main__":
+    from Fonts import Fonts
+    from videobot import engine
+
+    if len(sys.argv) < 2:
+        sys.exit("usage: python prerender.py <verses_data/topic.json> [processes]")
+    procs = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    cfg = engine.font_cfg(storage.BASE_DIR / "sources" / "fonts")
+    fonts = Fonts(cfg["fonts_paths"], cfg["fonts_sizes"], cfg["fonts_maxcharsline"])
+    stats = prerender_topic(sys.argv[1], fonts, procs)
+    print(f"{stats['rendered']} rendered, {stats['cached']} already cached "
+          f"({stats['total']} cards) in {stats['seconds']} s")
@@ -0,0 +1,95 @@
+# ── proxies.py ───────────────────────────────────────────────
+"""
+Background proxy library.
+
+Every stock clip in videos/ is transcoded once to the canonical render
+profile (1080x1920, 24 fps, yuv420p, 1 s GOP).  Renders then decode a
+small, uniform file instead of 4K / 60 fps originals, and `-r 24` no
+longer has to drop frames.
+
+    python proxies.py [video_folder]     # incremental build
+
+A proxy is used only while its sidecar still matches the source's size,
+mtime and PROFILE; anything else falls back to the original clip.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import storage
+
+PROFILE = {"width": 1080, "height": 1920, "fps": 24, "pix_fmt": "yuv420p",
+           "gop": 24, "preset": "veryfast", "crf": 18}
+
+PROXY_DIR = Path(os.getenv("VIDEOBOT_PROXY_DIR", storage.CACHE_DIR / "proxies"))
+
+
+def proxy_path(video_file: str) -> Path:
+    src = Path(video_file).resolve()
+    folder_id = hashlib.sha1(str(src.parent).encode()).hexdigest()[:8]
+    return PROXY_DIR / f"{src.stem}-{folder_id}.mp4"
+
+
+def _signature(video_file: str) -> dict:
+    st = os.stat(video_file)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "profile": PROFILE}
+
+
+def _sidecar(proxy: Path) -> Path:
+    return proxy.with_suffix(".json")
+
+
+def is_fresh(video_file: str) -> bool:
+    proxy = proxy_path(video_file)
+    try:
+        with open(_sidecar(proxy), encoding="utf-8") as f:
+            return proxy.exists() and json.load(f) == _signature(video_file)
+    except (OSError, ValueError):
+        return False
+
+
+def resolve(video_file: str) -> str:
+    """Proxy for video_file if an up-to-date one exists, else the original."""
+    return str(proxy_path(video_file)) if is_fresh(video_file) else video_file
+
+
+def build_proxy(video_file: str) -> Path:
+    p = PROFILE
+    proxy = proxy_path(video_file)
+    proxy.parent.mkdir(parents=True, exist_ok=True)
+    tmp = proxy.with_name(f".{proxy.stem}.{os.getpid()}.mp4")
+
+    subprocess.check_call([
+        "ffmpeg", "-loglevel", "error", "-y", "-i", video_file, "-an",
+        "-vf", (f"scale={p['width']}:{p['height']}:force_original_aspect_ratio=increase,"
+                f"crop={p['width']}:{p['height']},fps={p['fps']},format={p['pix_fmt']},setsar=1"),
+        "-c:v", "libx264", "-preset", p["preset"], "-crf", str(p["crf"]),
+        "-g", str(p["gop"]), "-keyint_min", str(p["gop"]), "-sc_threshold", "0",
+        "-movflags", "+faststart", str(tmp),
+    ])
+    os.replace(tmp, proxy)   # atomic: readers never see a half-written proxy
+    with open(_sidecar(proxy), "w", encoding="utf-8") as f:
+        json.dump(_signature(video_file), f)
+    return proxy
+
+
+def build_proxies(video_folder: str, force=False) -> list[Path]:
+    """Transcode every clip whose proxy is missing or stale."""
+    built = []
+    for f in sorted(os.listdir(video_folder)):
+        if not f.endswith(".mp4"):
+            continue
+        src = f"{video_folder}/{f}"
+        if force or not is_fresh(src):
+            print(f"building proxy for {f}", flush=True)
+            built.append(build_proxy(src))
+    return built
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else str(storage.BASE_DIR / "videos")
+    done = build_proxies(folder)
+    print(f"{len(done)} proxy(ies) rebuilt in {PROXY_DIR}")
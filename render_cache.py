@@ -0,0 +1,138 @@
+# ── render_cache.py ──────────────────────────────────────────
+"""
+Content-addressed cache of finished MP4s.
+
+The key is a SHA-1 over everything that reaches ffmpeg: background, audio
+and logo identity, the exact text PNGs (by content), their positions,
+the clip duration and the encoder settings.  A hit is hard-linked (or
+copied across filesystems) into the customer folder instead of encoding.
+
+• Size is capped by VIDEOBOT_RENDER_CACHE_MB (default 5000, 0 = off);
+  least-recently-used entries are evicted first.
+• hits / misses are counted in the same SQLite file – see stats().
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import storage
+
+DB_NAME   = "renders.sqlite"
+CACHE_DIR = storage.CACHE_DIR / "renders"
+CAP_BYTES = int(float(os.getenv("VIDEOBOT_RENDER_CACHE_MB", 5000)) * 1024 * 1024)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    key       TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS renders_lru ON renders (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _db():
+    conn = storage.connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _count(conn, name, n=1):
+    conn.execute("INSERT INTO counters VALUES (?, ?) "
+                 "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n))
+
+
+def _media_id(path: str) -> list:
+    st = os.stat(path)
+    return [os.path.basename(path), st.st_size, st.st_mtime_ns]
+
+
+def key_for(spec: dict, encoder: dict) -> str:
+    """Cache key of one render spec (see ffmpeg.prepare_render)."""
+    parts = {
+        "video":       _media_id(spec["video_file"]),
+        "audio":       _media_id(spec["audio"]),
+        "audio_codec": spec["audio_codec"],
+        "logo":        storage.file_digest(spec["logo"]),
+        "logo_y":      spec["logo_y"],
+        "loop_logo":   spec["loop_logo"],
+        "layers":      [[storage.file_digest(png), x, y] for png, x, y in spec["layers"]],
+        "duration":    spec["duration"],
+        "encoder":     encoder,
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _path(key: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.mp4"
+
+
+def fetch(key: str, out_path: str) -> bool:
+    """Place the cached render at out_path; False on a miss."""
+    if CAP_BYTES <= 0:
+        return False
+    conn = _db()
+    cached = _path(key)
+    hit = cached.exists() and conn.execute(
+        "UPDATE renders SET last_used = ? WHERE key = ?", (time.time(), key)).rowcount
+    if hit:
+        try:
+            storage.link_or_copy(cached, out_path)
+        except FileNotFoundError:        # evicted by another worker just now
+            hit = False
+    _count(conn, "hits" if hit else "misses")
+    return bool(hit)
+
+
+def store(key: str, out_path: str):
+    """Add a finished render to the cache, then evict down to CAP_BYTES."""
+    if CAP_BYTES <= 0:
+        return
+    cached = _path(key)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    storage.link_or_copy(out_path, cached)
+
+    conn = _db()
+    conn.execute("INSERT OR REPLACE INTO renders VALUES (?, ?, ?)",
+                 (key, cached.stat().st_size, time.time()))
+    evict(conn)
+
+
+def evict(conn=None):
+    conn = conn or _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM renders").fetchone()[0]
+        for row in conn.execute("SELECT key, size FROM renders ORDER BY last_used").fetchall():
+            if total <= CAP_BYTES:
+                break
+            _path(row["key"]).unlink(missing_ok=True)
+            conn.execute("DELETE FROM renders WHERE key = ?", (row["key"],))
+            _count(conn, "evictions")
+            total -= row["size"]
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def stats() -> dict:
+    conn = _db()
+    counters = {r["name"]: r["value"] for r in conn.execute("SELECT * FROM counters")}
+    entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM renders").fetchone()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "hits":      hits,
+        "misses":    misses,
+        "hit_rate":  round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "evictions": counters.get("evictions", 0),
+        "entries":   entries,
+        "bytes":     size,
+        "cap_bytes": CAP_BYTES,
+    }
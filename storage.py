@@ -0,0 +1,136 @@
+# ── storage.py ───────────────────────────────────────────────
+"""
+Shared on-disk locations for state that outlives a single job.
+
+• Everything lives under VIDEOBOT_CACHE_DIR (default: <project>/cache), so
+  the web service and every worker container see the same files through
+  the `.:/app` volume from docker-compose.
+• SQLite databases are opened in WAL mode with one connection per
+  process *and* thread, which makes them safe to share between Celery
+  prefork children.
+• Plain file caches (verse cards, text layers) are kept under a size cap
+  by mtime-LRU: a hit touches its file, and every PRUNE_EVERY new files
+  the oldest ones are removed until the folder is back under the cap.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+BASE_DIR  = Path(__file__).resolve().parent
+CACHE_DIR = Path(os.getenv("VIDEOBOT_CACHE_DIR", BASE_DIR / "cache"))
+
+PRUNE_EVERY = 100                 # new files per process between two prune() scans
+
+_local = threading.local()
+_writes = {}
+_writes_lock = threading.Lock()
+
+
+def cache_path(*bits: str) -> Path:
+    """Return CACHE_DIR/<bits…>, creating the parent directory."""
+    p = CACHE_DIR.joinpath(*bits)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """
+    Per-process, per-thread connection to CACHE_DIR/<name>.
+    A connection inherited through fork() is never reused.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None or getattr(_local, "pid", None) != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+
+    conn = conns.get(name)
+    if conn is None:
+        conn = sqlite3.connect(cache_path(name), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[name] = conn
+    return conn
+
+
+@lru_cache(maxsize=1024)
+def _digest(path: str, size: int, mtime_ns: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def file_digest(path) -> str:
+    """SHA-1 of a (small) file's contents, memoised per (path, size, mtime)."""
+    st = os.stat(path)
+    return _digest(str(path), st.st_size, st.st_mtime_ns)
+
+
+def link_or_copy(src, dst):
+    """Atomically make dst a hard link to src (a copy across filesystems)."""
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return                           # rename() onto the same inode is a no-op
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:                      # other filesystem / no hardlinks
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+# ---------- size-capped file caches ----------------------------------
+def touch(path):
+    """Mark a cached file as recently used (its mtime is the LRU clock)."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def prune(subdir: str, cap_bytes: int) -> int:
+    """
+    Delete the least recently used files of CACHE_DIR/<subdir> until it
+    holds at most 90 % of cap_bytes; returns how many were removed.
+    Copies already linked into customer folders are not affected.
+    """
+    files = []
+    stack = [CACHE_DIR / subdir]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
+            continue
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                stack.append(e.path)
+            elif e.is_file(follow_symlinks=False) and not e.name.startswith("."):
+                st = e.stat(follow_symlinks=False)
+                files.append((st.st_mtime, st.st_size, e.path))
+
+    total = sum(size for _, size, _ in files)
+    if total <= cap_bytes:
+        return 0
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= cap_bytes * 0.9:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:        # pruned by another process just now
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def wrote(subdir: str, cap_bytes: int):
+    """Count one new file in CACHE_DIR/<subdir>; prune it every PRUNE_EVERY files."""
+    if cap_bytes <= 0:
+        return
+    with _writes_lock:
+        n = _writes[subdir] = _writes.get(subdir, 0) + 1
+    if n % PRUNE_EVERY == 0:
+        prune(subdir, cap_bytes)
@@ -0,0 +1,98 @@
+# ── text_layout.py ───────────────────────────────────────────
+"""
+Pixel-accurate line breaking.
+
+Widths come from the font registry's cached advance + kerning tables
+(Fonts.FontFace), so laying out a verse never rasterises anything.
+Breaks are chosen by a minimum-raggedness dynamic program – the
+Knuth–Plass total-fit idea without stretchable glue – in one pass:
+
+    cost(line) = (max_width - line_width)²       (overflow: not allowed)
+
+With balanced=True the last line is scored too, which gives the even,
+centred blocks we want on a video; otherwise it is free, like a paragraph.
+"""
+import Fonts
+from Fonts import FontFace
+
+
+def wrap(text: str, face: FontFace, max_width: float, balanced=True) -> list[str]:
+    """Break text into lines no wider than max_width (single long words excepted)."""
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split()
+        lines += _break_words(words, face, max_width, balanced) if words else [""]
+    return lines
+
+
+def _break_words(words, face, max_width, balanced):
+    n = len(words)
+    widths = [face.word_width(w) for w in words]
+    space = face.advance(" ")
+
+    # best[i] = (cost, break) for laying out words[i:]
+    best = [(0.0, n)] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        line_w, choice = -space, None
+        for j in range(i, n):
+            line_w += space + widths[j]
+            if line_w > max_width and j > i:
+                break
+            last = j == n - 1
+            slack = max(max_width - line_w, 0.0)
+            cost = (0.0 if last and not balanced else slack * slack) + best[j + 1][0]
+            if choice is None or cost < choice[0]:
+                choice = (cost, j + 1)
+        best[i] = choice
+
+    lines, i = [], 0
+    while i < n:
+        j = best[i][1]
+        lines.append(" ".join(words[i:j]))
+        i = j
+    return lines
+
+
+def line_widths(lines, face: FontFace) -> list[float]:
+    return [face.text_width(line) for line in lines]
+
+
+def block_height(lines, face: FontFace) -> int:
+    """Height of the multiline block as ImageDraw lays it out."""
+    return (len(lines) - 1) * face.line_pitch + face.line_height
+
+
+# ---------- AUTO-FIT ----------------------------------------------
+METRIC_SIZE = 200      # reference size whose tables are scaled during the search
+
+
+def fits(lines, face: FontFace, max_width: float, max_height: float, scale=1.0) -> bool:
+    return (block_height(lines, face) * scale <= max_height
+            and max(line_widths(lines, face)) * scale <= max_width)
+
+
+def fit_size(text: str, font_path, max_width: float, max_height: float,
+             min_size=36, max_size=120) -> tuple[int, list[str]]:
+    """
+    Largest font size in [min_size, max_size] whose wrapped text fits the
+    box.  The binary search runs on one METRIC_SIZE face scaled linearly
+    (wrapping at max_width / scale), then the winner is confirmed with the
+    real face – hinting can make a size a pixel wider than the scaled
+    estimate, in which case we step down.
+    """
+    ref = Fonts.get_face(font_path, METRIC_SIZE)
+
+    lo, hi = min_size, max_size
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        scale = mid / METRIC_SIZE
+        if fits(wrap(text, ref, max_width / scale), ref, max_width, max_height, scale):
+            lo = mid
+        else:
+            hi = mid - 1
+
+    for size in range(lo, min_size - 1, -1):
+        face = Fonts.get_face(font_path, size)
+        lines = wrap(text, face, max_width)
+        if fits(lines, face, max_width, max_height) or size == min_size:
+            return size, lines
@@ -1,31 +1,97 @@
 # ── verse_handler.py  (FULL FILE) ─────────────────────────────────
 import csv
-import textwrap
+import hashlib
+import math
+import io
+import os
+import subprocess
+import threading
 from pathlib import Path
-from string import ascii_letters
 from PIL import Image, ImageDraw, ImageFont
 
+import Fonts
+import glyph_atlas
+import storage
+import text_layout
+
 # ---------- CONFIG ------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parent
-FALLBACK_FONT = BASE_DIR.joinpath(
-    "..", "sources", "fonts", "PermanentMarker-Regular.ttf"  # <-- make sure this file exists
-).resolve()
+FALLBACK_FONT = Fonts.FALLBACK_FONT
 
 # ---------- SAFE FONT LOADER -------------------------------------
 def load_font_safe(path: str | Path, size: int) -> ImageFont.FreeTypeFont:
-    """Try chosen font → fallback font → built-in default (never crash)."""
-    print("DEBUG – trying font:", path, flush=True)
+    """Registry-backed: the face is opened once per process (see Fonts.py)."""
+    return Fonts.get_face(path, size).font
+
+# ---------- IMAGE CREATION (USED BY FFMPEG) -----------------------
+SHADOW_COLOR = (0, 0, 0, 80)
+TEXT_WIDTH = 0.8            # widest verse line, as a fraction of the frame width
+# frame layout (ffmpeg.prepare_render), px: the verse's top edge, the gap
+# below it and the lowest top edge of the reference – a taller verse
+# pushes the whole block up
+VERSE_Y, REF_GAP, REF_MAX_Y = 800, 75, 1200
+# tallest auto-fitted verse block: the reference still sits at the gap below
+# it (minus the few px the drop shadow / ink can outgrow the measured block)
+AUTOFIT_HEIGHT = REF_MAX_Y - VERSE_Y - REF_GAP - 5
+RENDER_VERSION = 3          # bump when the rasterizer output changes
+# "pil" = ImageDraw.text per verse, "atlas" = NumPy glyph blitting (glyph_atlas.py)
+RASTERIZER = os.getenv("VIDEOBOT_RASTERIZER", "pil")
+# cache/verses is LRU-capped (storage.prune), shared with compositor's layers setting
+VERSE_CAP = int(float(os.getenv("VIDEOBOT_TEXT_CACHE_MB", 1000)) * 1024 * 1024)
+
+_heights: dict[str, int] = {}   # cached verse PNG → height (per process)
+
+
+def fit_font_size(text: str, font_path: str, frame_size: tuple[int, int],
+                  min_size=36, max_size=120) -> int:
+    """
+    Largest size at which the wrapped verse fits the auto-fit box (frame
+    width × AUTOFIT_HEIGHT), so prepare_render never has to lift it.
+    """
+    size, _ = text_layout.fit_size(
+        text, font_path, frame_size[0] * TEXT_WIDTH, AUTOFIT_HEIGHT,
+        min_size, max_size)
+    return size
+
+
+def verse_key(text, font_path, font_size, max_char_count, image_size, text_color) -> str:
+    """Content hash of everything that decides how a verse PNG looks."""
     try:
-        return ImageFont.truetype(str(path), size=size)
+        font_id = storage.file_digest(font_path)
     except OSError:
-        print("WARNING – font unusable, falling back to:", FALLBACK_FONT, flush=True)
-        try:
-            return ImageFont.truetype(str(FALLBACK_FONT), size=size)
-        except OSError:
-            print("ERROR – fallback font missing; using built-in default", flush=True)
-            return ImageFont.load_default()
+        font_id = str(font_path)        # missing font → fallback; still deterministic
+    return hashlib.sha1(repr((
+        RENDER_VERSION, RASTERIZER, text, font_id, font_size, max_char_count,
+        image_size[0], tuple(text_color), SHADOW_COLOR,
+    )).encode()).hexdigest()
+
+
+def cached_verse(text, font_path, font_size, max_char_count, image_size,
+                 text_color=(255, 255, 255, 255)):
+    """
+    Make sure the verse PNG exists in cache/verses (rendering it if not).
+    Returns (key, cached path, rendered height).
+    """
+    key = verse_key(text, font_path, font_size, max_char_count, image_size, text_color)
+    cached = storage.cache_path("verses", key[:2], f"{key}.png")
+
+    if cached.exists():
+        storage.touch(cached)
+        height = _heights.get(key)
+        if height is None:
+            with Image.open(cached) as im:      # header only, no decode
+                height = im.height
+    else:
+        final = render_verse(text, font_path, font_size, max_char_count, image_size, text_color)
+        height = final.height
+        tmp = cached.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.png")
+        final.save(tmp)
+        os.replace(tmp, cached)
+        storage.wrote("verses", VERSE_CAP)
+    _heights[key] = height
+    return key, cached, height
+
 
-# ---------- IMAGE CREATION (USED BY FFMPEG) -----------------------
 def create_image(
     text: str,
     font_path: str,
@@ -36,49 +102,116 @@ def create_image(
     text_source: str,
     text_color=(255, 255, 255, 255),
 ):
+    """
+    Render (or fetch from cache/verses) the verse PNG and link it into
+    <save_path>/verse_images as "<reference>-<hash>.png".
+    Lines are broken by measured width (text_layout); max_char_count is
+    only kept for callers and the cache key.
+    Returns (path, rendered height).
+    """
     save_path = Path(save_path) / "verse_images"
     save_path.mkdir(parents=True, exist_ok=True)
 
-    img = Image.new("RGBA", image_size, color=(190, 190, 190, 0))
-    font = load_font_safe(font_path, font_size)
+    key, cached, height = cached_verse(text, font_path, font_size, max_char_count,
+                                       image_size, text_color)
 
-    avg_char_w = sum(font.getbbox(ch)[2] for ch in ascii_letters) / len(ascii_letters)
-    max_char_count = max(int(img.size[0] * 0.718 / avg_char_w), max_char_count)
-    wrapped = textwrap.fill(text, width=max_char_count)
+    # the content hash makes the name unique – no probing for a free "-N" suffix
+    fname = (text_source or "verse").replace(":", "")
+    out = save_path / f"{fname}-{key[:10]}.png"
+    storage.link_or_copy(cached, out)
+    return str(out), height
 
-    shadow = Image.new("RGBA", img.size, (255, 255, 255, 0))
+
+_measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))   # textbbox only, never drawn on
+
+
+def render_verse(text, font_path, font_size, max_char_count, image_size,
+                 text_color=(255, 255, 255, 255)) -> Image.Image:
+    """
+    Verse + drop shadow, cropped to the text's ink.  The text block is
+    measured first and both layers are drawn on a canvas of exactly that
+    size (+ the shadow offset), instead of two full image_size canvases.
+    Positions keep their fractional part, so pixels match the full-canvas
+    render.  With VIDEOBOT_RASTERIZER=atlas the same layout is blitted
+    from a per-(font, size) glyph atlas instead (glyph_atlas.py).
+    """
+    if RASTERIZER == "atlas":
+        return glyph_atlas.render_verse(text, font_path, font_size, image_size,
+                                        image_size[0] * TEXT_WIDTH, text_color, SHADOW_COLOR)
+
+    face = Fonts.get_face(font_path, font_size)
+    font = face.font
+    w, h = image_size
+
+    wrapped = "\n".join(text_layout.wrap(text, face, w * TEXT_WIDTH))
+    cx, cy = w / 2, h / 2
+
+    # canvas = text bbox padded for the (-1, +4) shadow, clipped to the image
+    x0, y0, x1, y1 = _measure.multiline_textbbox(
+        (cx, cy), wrapped, font=font, anchor="mm", align="center")
+    ox, oy = max(0, math.floor(x0) - 2), max(0, math.floor(y0) - 2)
+    size = (min(w, math.ceil(x1) + 2) - ox, min(h, math.ceil(y1) + 5) - oy)
+
+    shadow = Image.new("RGBA", size, (255, 255, 255, 0))
     ImageDraw.Draw(shadow).text(
-        (img.size[0] / 2 - 1, img.size[1] / 2 + 4),
-        wrapped, font=font, fill=(0, 0, 0, 80),
+        (cx - 1 - ox, cy + 4 - oy),
+        wrapped, font=font, fill=SHADOW_COLOR,
         anchor="mm", align="center"
     )
-    draw = ImageDraw.Draw(img)
-    draw.text(
-        (img.size[0] / 2, img.size[1] / 2),
+    img = Image.new("RGBA", size, color=(190, 190, 190, 0))
+    ImageDraw.Draw(img).text(
+        (cx - ox, cy - oy),
         wrapped, font=font, fill=text_color,
         anchor="mm", align="center"
     )
 
-    final = Image.alpha_composite(shadow, img).crop(img.getbbox())
-    rendered_h = final.height
-
-    fname = (text_source or "verse").replace(":", "")
-    out = save_path / f"{fname}.png"
-    i = 1
-    while out.exists():
-        out = save_path / f"{fname}-{i}.png"; i += 1
-    final.save(out)
-    return str(out), rendered_h
+    return Image.alpha_composite(shadow, img).crop(img.getbbox())
 
 # ---------- HELPERS NEEDED BY ffmpeg.py ---------------------------
-def add_sheets(video_names, output_path, customer_name, refs, verses):
-    """Create a simple CSV with (video, reference, verse) rows."""
+def add_sheets(video_names, output_path, customer_name, refs, verses, font_sizes=None):
+    """
+    Create a simple CSV with (video, reference, verse) rows, plus a
+    "Font Size" column when font_sizes is given (auto-fit jobs).
+    """
     csv_path = Path(output_path) / f"{customer_name}.csv"
     with csv_path.open("w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
-        w.writerow(["File Name", "Reference", "Verse"])
-        for v, r, t in zip(video_names, refs, verses):
-            w.writerow([v, r, t])
+        if font_sizes is None:
+            w.writerow(["File Name", "Reference", "Verse"])
+            for v, r, t in zip(video_names, refs, verses):
+                w.writerow([v, r, t])
+        else:
+            w.writerow(["File Name", "Reference", "Verse", "Font Size"])
+            for v, r, t, s in zip(video_names, refs, verses, font_sizes):
+                w.writerow([v, r, t, s])
+
+POST_SIZE = 1080            # square post image edge
+POST_AT   = 3.0             # seconds into the video (the verse is on screen from t=1)
+
+def create_post_images(video_path: str, output_folder: str):
+    """
+    Square JPEG post for a finished video: one frame at POST_AT s,
+    centre-cropped and scaled to POST_SIZE², saved as <video name>.jpg.
+    """
+    frame = subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-ss", str(POST_AT), "-i", str(video_path),
+         "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-"],
+        check=True, stdout=subprocess.PIPE).stdout
+    with Image.open(io.BytesIO(frame)) as im:
+        img = im.convert("RGB")
+
+    side = min(img.size)
+    left, top = (img.width - side) // 2, (img.height - side) // 2
+    img = img.crop((left, top, left + side, top + side))
+    if side != POST_SIZE:
+        img = img.resize((POST_SIZE, POST_SIZE), Image.LANCZOS)
+
+    os.makedirs(output_folder, exist_ok=True)
+    out = Path(output_folder) / f"{Path(video_path).stem}.jpg"
+    tmp = out.with_name(f".{out.stem}.{os.getpid()}.{threading.get_ident()}.jpg")
+    img.save(tmp, quality=92)
+    os.replace(tmp, out)
+    return str(out)
 
 def rename_videos(video_folder, csv_file):
     """Stub.  Implement if you need smarter renaming later."""
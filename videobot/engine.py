@@ -3,16 +3,60 @@ import os
 from pathlib import Path
 from uuid import uuid4
 import ffmpeg  # your existing module
-from Fonts import Fonts         # your existing helper
+from Fonts import Fonts, get_face   # font registry
+import compositor
+import corpus
+import history
 import json_handler             # existing
 import verse_handler            # existing
 
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# (file in sources/fonts, size, max chars per line) – the fonts every job rotates through
+FONT_TABLE = [
+    ("CoffeeJellyUmai.ttf",          95, 34),
+    ("CourierprimecodeRegular.ttf",  70, 25),
+    ("PineappleDays.ttf",            65, 30),
+    ("GreenTeaJelly.ttf",            85, 45),
+    ("HeyMarch.ttf",                 75, 33),
+    ("LetsCoffee.otf",               50, 34),
+    ("LikeSlim.ttf",                 75, 35),
+    ("SunnySpellsBasicRegular.ttf",  87, 32),
+    ("TakeCoffee.ttf",               50, 35),
+    ("WantCoffee.ttf",               65, 35),
+]
+REF_FONT = BASE_DIR / "sources" / "MouldyCheeseRegular-WyMWG.ttf"
+
+
+def font_cfg(fonts_dir) -> dict:
+    """The fonts_* cfg lists for FONT_TABLE under fonts_dir."""
+    return {
+        "fonts_paths":        [str(Path(fonts_dir) / name) for name, _, _ in FONT_TABLE],
+        "fonts_sizes":        [size for _, size, _ in FONT_TABLE],
+        "fonts_maxcharsline": [chars for _, _, chars in FONT_TABLE],
+    }
+
+
+def warm_fonts():
+    """Open every job font and the reference font once, at worker start."""
+    cfg = font_cfg(BASE_DIR / "sources" / "fonts")
+    Fonts(cfg["fonts_paths"], cfg["fonts_sizes"], cfg["fonts_maxcharsline"]).warm()
+    get_face(REF_FONT, compositor.REF_FONT_SIZE)
+
+
 def make_videos(cfg: dict) -> Path:
     """
     cfg keys (all strings unless noted):
         video_folder, audio_folder, json_file, fonts_dir,
         output_folder, text_source_font, image_file,
         customer_name, number_of_videos (int)
+    optional:
+        render_workers (int) – parallel ffmpeg encodes (default: auto)
+        autofit (bool)       – size each verse to fit its box; sizes go in the CSV
+        topic                – draw verses from the corpus (corpus.py) instead of
+                               json_file; min_length / max_length / translation
+                               narrow the draw
+        avoid_repeats (bool) – skip verses / combos the customer already got (default on)
     Returns: Path to the output directory that now contains the videos.
     """
     fonts = Fonts(cfg["fonts_paths"],
@@ -30,5 +74,108 @@ def make_videos(cfg: dict) -> Path:
         customer_name=cfg["customer_name"],
         number_of_videos=cfg["number_of_videos"],
         fonts=fonts,
+        workers=cfg.get("render_workers"),
+        autofit=cfg.get("autofit", False),
+        topic=cfg.get("topic"),
+        min_len=cfg.get("min_length"),
+        max_len=cfg.get("max_length"),
+        translation=cfg.get("translation") or corpus.DEFAULT_TRANSLATION,
+        avoid_repeats=cfg.get("avoid_repeats", True),
     )
     return Path(cfg["output_folder"]) / cfg["customer_name"]
+
+
+# ---------- fan-out: per-video stage tasks (videobot/tasks.py) ----
+def plan_job(cfg: dict) -> dict:
+    """
+    Pick verse, background, audio and font for every video of cfg (same
+    keys as make_videos) and probe the media library; nothing is rendered
+    yet.  Returns plain data:
+    {"output_path": str, "jobs": [job, ...], "units": [[index, ...], ...]}
+    – a unit is the videos one encode task writes (plan_units).
+    """
+    fonts = Fonts(cfg["fonts_paths"], cfg["fonts_sizes"], cfg["fonts_maxcharsline"])
+    hist = history.History(cfg["customer_name"]) if cfg.get("avoid_repeats", True) else None
+
+    verses, refs, n = ffmpeg.select_verses(
+        cfg["json_file"], cfg["number_of_videos"], cfg.get("topic"),
+        cfg.get("min_length"), cfg.get("max_length"),
+        cfg.get("translation") or corpus.DEFAULT_TRANSLATION, hist)
+    video_files, audio_files = ffmpeg.list_media(cfg["video_folder"], cfg["audio_folder"])
+    slots = ffmpeg.assign_slots(n, len(video_files), len(audio_files), len(fonts))
+    output_path = ffmpeg.create_dirs(cfg["output_folder"], cfg["customer_name"], posts=False)
+
+    jobs = list(ffmpeg.plan_jobs(verses, refs, slots, video_files, audio_files, fonts, hist))
+    return {"output_path": output_path, "jobs": jobs, "units": plan_units(jobs)}
+
+
+def plan_units(jobs: list) -> list:
+    """
+    Job indices grouped by background, at most max_group_size each, in
+    plan order: one render_text → encode_video pair per unit, so videos
+    sharing a clip still come from one decode (ffmpeg.create_videos).
+    The planner's CPU share says nothing about the encode worker's, so
+    only the group limit and memory bound the unit here; encode_unit
+    splits it by the encoder's threads.
+    """
+    size = ffmpeg.max_group_size(1)
+    by_bg = {}
+    for job in jobs:
+        by_bg.setdefault(job["video_file"], []).append(job["index"])
+    return [indices[i:i + size] for indices in by_bg.values()
+            for i in range(0, len(indices), size)]
+
+
+def render_text(cfg: dict, output_path: str, job: dict) -> dict:
+    """
+    Light half of one planned video: verse card, reference sprite and the
+    render spec (spec None when the render cache already placed it).
+    """
+    spec = ffmpeg.prepare_job(job, cfg["text_source_font"], cfg["image_file"], output_path,
+                              autofit=cfg.get("autofit", False))
+    return {"index": job["index"], "font_size": job["font_size"], "spec": spec}
+
+
+def encode_unit(prepared: list, reporter=None) -> list:
+    """
+    Heavy half: x264 encode of one unit's render_text() results with this
+    worker's CPU share – specs sharing background and logo go through one
+    ffmpeg, split at this worker's max_group_size.  reporter(indices) →
+    progress(stats) callback for those videos (ffmpeg's live numbers).
+    """
+    threads = ffmpeg.cpu_budget()
+    size = ffmpeg.max_group_size(1, threads)
+    groups = {}
+    for p in prepared:
+        spec = p["spec"]
+        if spec is not None:
+            key = (spec["video_file"], spec["logo"], spec["loop_logo"])
+            groups.setdefault(key, []).append(spec)
+
+    cached = [p["index"] for p in prepared if p["spec"] is None]
+    if cached and reporter is not None:
+        reporter(cached)({"out_time": 0.0, "fps": 0.0, "speed": 0.0, "percent": 100.0})
+    for specs in groups.values():
+        for i in range(0, len(specs), size):
+            group = specs[i:i + size]
+            ffmpeg.encode_unit(group, threads, progress=reporter(
+                [spec["index"] for spec in group]) if reporter is not None else None)
+    return [{"index": p["index"], "font_size": p["font_size"], "cached": p["spec"] is None}
+            for p in prepared]
+
+
+def finish_job(cfg: dict, plan: dict, results: list) -> Path:
+    """
+    CSV manifest + customer history, once every video of plan exists;
+    results holds one encode_unit() list per unit.
+    """
+    sizes = {r["index"]: r["font_size"] for unit in results for r in unit}
+    jobs = [dict(job, font_size=sizes.get(job["index"], job["font"][1])) for job in plan["jobs"]]
+    ffmpeg.write_manifest(jobs, plan["output_path"], cfg["customer_name"], cfg.get("autofit", False))
+
+    if cfg.get("avoid_repeats", True):
+        hist = history.History(cfg["customer_name"])
+        for job in jobs:
+            hist.record(job["text_verse"], job["video_file"], job["audio_file"], job["font"][0])
+        hist.commit()
+    return Path(cfg["output_folder"]) / cfg["customer_name"]
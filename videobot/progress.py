@@ -0,0 +1,120 @@
+# ── videobot/progress.py ────────────────────────────────────
+"""
+Live encode progress of a job, kept in Redis next to the Celery results.
+
+• Each encode_video task parses ffmpeg's -progress stream
+  (ffmpeg.encode_video) and writes the numbers of the videos that run
+  writes, one field each, into the hash videobot:progress:<job_id>;
+  the hash also holds the job's start time and video count.
+• After every write the whole hash is summed up and stored as the job's
+  PROGRESS meta (update_state on the job id), so /status/<job_id> reads
+  one result key, as before.
+• Writes are throttled to one per INTERVAL seconds per ffmpeg run (the last
+  one – 100 % – always goes through).
+• Every state change and progress write is also published on the
+  CHANNEL pub/sub channel as {"job_id", "status", ...} – the /events
+  and /ws push endpoints of webapp.py (event_hub.py) stream them.
+"""
+import json
+import time
+
+import redis
+
+from celery_app import celery
+
+CHANNEL  = "videobot:events"
+INTERVAL = 1.0                   # seconds between two reports of one video
+TTL      = 24 * 3600             # the hash outlives the job result by a bit
+STARTED, VIDEOS = "started", "videos"
+
+_client = None
+
+
+def key(job_id: str) -> str:
+    return f"videobot:progress:{job_id}"
+
+
+def client():
+    """Redis client on the result backend, or None (eager / non-Redis backends)."""
+    global _client
+    url = str(celery.conf.result_backend or "")
+    if not url.startswith(("redis://", "rediss://")):
+        return None
+    if _client is None:
+        _client = redis.Redis.from_url(url)
+    return _client
+
+
+def summary(fields: dict, now: float = None) -> dict:
+    """
+    PROGRESS meta from the raw hash: the most recently reported video,
+    job-wide percent and an ETA (seconds) extrapolated from elapsed time.
+    """
+    fields = {k.decode() if isinstance(k, bytes) else k: v for k, v in fields.items()}
+    videos = int(fields.pop(VIDEOS, 0) or 0)
+    started = float(fields.pop(STARTED, 0) or 0)
+    per_video = [json.loads(v) for v in fields.values()]
+
+    meta = {"videos": videos,
+            "done": sum(1 for p in per_video if p["percent"] >= 100),
+            "percent": round(sum(p["percent"] for p in per_video) / videos, 1) if videos else 0.0}
+    if per_video:
+        current = max(per_video, key=lambda p: p["at"])
+        meta.update({k: current[k] for k in ("index", "out_time", "fps", "speed")},
+                    video_percent=current["percent"])
+    meta["started"] = started
+    meta["eta"] = eta(started, meta["percent"], now)
+    return meta
+
+
+def eta(started: float, percent: float, now: float = None):
+    """Seconds left at the job's average rate so far; None until there is a rate."""
+    if not started or percent <= 0:
+        return None
+    elapsed = (now or time.time()) - started
+    return round(elapsed * (100 - percent) / percent, 1)
+
+
+def publish(job_id: str, status: str, **fields):
+    """One event on CHANNEL for the web processes (no-op without Redis)."""
+    r = client()
+    if r is not None and job_id:
+        r.publish(CHANNEL, json.dumps({"job_id": job_id, "status": status, **fields}))
+
+
+def start(task, job_id: str, videos: int):
+    """Job planned: record start time and size, publish 0 %."""
+    r = client()
+    if r is None:
+        return
+    now = time.time()
+    r.pipeline().hset(key(job_id), mapping={STARTED: now, VIDEOS: videos}) \
+                .expire(key(job_id), TTL).execute()
+    meta = summary({STARTED: now, VIDEOS: videos}, now)
+    task.update_state(task_id=job_id, state="PROGRESS", meta=meta)
+    publish(job_id, "working", **meta)
+
+
+class Reporter:
+    """Throttled ffmpeg progress callback for the videos of one ffmpeg run."""
+
+    def __init__(self, task, job_id: str, indices: list):
+        self.task, self.job_id, self.indices = task, job_id, indices
+        self.last = 0.0
+
+    def __call__(self, stats: dict):
+        now = time.time()
+        if stats["percent"] < 100 and now - self.last < INTERVAL:
+            return
+        self.last = now
+        r = client()
+        if r is None:
+            return
+        # one decode writes all of them: they advance together
+        mapping = {str(i): json.dumps(dict(stats, index=i, at=now)) for i in self.indices}
+        _, _, fields = r.pipeline().hset(key(self.job_id), mapping=mapping) \
+                                   .expire(key(self.job_id), TTL) \
+                                   .hgetall(key(self.job_id)).execute()
+        meta = summary(fields, now)
+        self.task.update_state(task_id=self.job_id, state="PROGRESS", meta=meta)
+        publish(self.job_id, "working", **meta)
@@ -1,21 +1,116 @@
 # ── videobot/tasks.py ───────────────────────────────────────
+import os
 from pathlib import Path
-from celery import Celery
+from celery import Celery, chord
+from celery.concurrency import get_implementation
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import task_failure, worker_init, worker_process_init
+import ffmpeg
 from videobot import engine      # your heavy video maker
+from videobot import progress
 
 from celery_app import celery    # import the Celery() object
 
+def is_prefork(worker) -> bool:
+    return get_implementation(worker.pool_cls) is PreforkPool
+
+def consumes(worker, queue: str) -> bool:
+    return queue in worker.app.amqp.queues.consume_from
+
+@worker_init.connect
+def share_cpus(sender=None, **_):
+    """
+    Split this node's CPU budget between the prefork children of an
+    encode worker (they inherit the env), so N concurrent encodes don't
+    each take every core.  Planning / text workers keep the whole budget.
+    """
+    if sender is None or os.getenv("VIDEOBOT_CPUS"):
+        return
+    if is_prefork(sender) and consumes(sender, "encode"):
+        os.environ["VIDEOBOT_CPUS"] = str(max(1, ffmpeg.cpu_budget() // max(1, sender.concurrency)))
+
+_warm_children = False
+
+@worker_init.connect
+def warm_worker(sender=None, **_):
+    """
+    Preload fonts on workers that consume the render_text queue (an
+    encode-only worker never opens one).  Thread / solo pools run their
+    tasks in this process, so warm it now; prefork children warm
+    themselves (warm_child) before their first job.
+    """
+    global _warm_children
+    if sender is None or not consumes(sender, "render_text"):
+        return
+    if is_prefork(sender):
+        _warm_children = True
+    else:
+        engine.warm_fonts()
+
+@worker_process_init.connect
+def warm_child(**_):
+    if _warm_children:
+        engine.warm_fonts()
+
+@task_failure.connect
+def publish_failure(sender=None, task_id=None, exception=None, **_):
+    """Any failing stage fails its job: tell /events listeners right away."""
+    job_id = getattr(sender.request, "root_id", None) or task_id
+    progress.publish(job_id, "error", detail=str(exception))
+
+def job_result(output_path, job_id=None) -> dict:
+    # gather every .mp4 the engine produced
+    files = [p.name for p in Path(output_path).glob("*.mp4")]
+    result = {"folder": str(output_path), "files": files}
+    progress.publish(job_id, "done", **result)
+    return result
+
 @celery.task(bind=True)
 def run_video_job(self, cfg: dict):
     """
-    Celery entry-point.  Returns a dict:
+    Celery entry-point (probe queue).  Plans the job, then replaces itself
+    with a chord: per unit (videos sharing a background, engine.plan_units)
+    render_text → encode_video, each on its own queue (routes in
+    celery_app.py), and finish_job once all of them are done.  The chord result inherits this task's id, so /status/<job_id>
+    still ends with:
       { "folder": "/app/customers/acme_inc",
         "files":  ["0-foo.mp4", "1-bar.mp4"] }
     """
-    output_path: Path = engine.make_videos(cfg)
+    job_id = self.request.id
+    plan = engine.plan_job(cfg)
+    if not plan["jobs"]:
+        return job_result(engine.finish_job(cfg, plan, []), job_id)
 
-    # gather every .mp4 the engine produced
-    files = [p.name for p in Path(output_path).glob("*.mp4")]
+    progress.start(self, job_id, len(plan["jobs"]))
+    units = [[plan["jobs"][i] for i in unit] for unit in plan["units"]]
+    header = [render_text.s(cfg, plan["output_path"], jobs) | encode_video.s(job_id)
+              for jobs in units]
+    if self.request.is_eager:
+        # replace() would .get() the chord inside this task: run the stages inline
+        results = [encode_video(render_text(cfg, plan["output_path"], jobs), job_id)
+                   for jobs in units]
+        return job_result(engine.finish_job(cfg, plan, results), job_id)
+    return self.replace(chord(header, finish_job.s(cfg, plan)))   # raises Ignore
+
+@celery.task
+def render_text(cfg: dict, output_path: str, jobs: list):
+    """Verse cards + render specs of one unit → [{"index", "font_size", "spec"}, ...]."""
+    return [engine.render_text(cfg, output_path, job) for job in jobs]
+
+@celery.task(bind=True)
+def encode_video(self, prepared: list, job_id: str = None):
+    """
+    x264 encode of one unit's render_text results, one decode per
+    background → [{"index", "font_size", "cached"}, ...]; live progress
+    goes to the job's PROGRESS state (videobot/progress.py).
+    """
+    reporter = (lambda indices: progress.Reporter(self, job_id, indices)) if job_id else None
+    return engine.encode_unit(prepared, reporter)
+
+@celery.task(bind=True)
+def finish_job(self, results: list, cfg: dict, plan: dict):
+    """Chord callback (runs under the job's id): CSV manifest + history, then the result payload."""
+    output_path = engine.finish_job(cfg, plan, results)
 
     # task result saved in Redis → web service can read it
-    return {"folder": str(output_path), "files": files}
+    return job_result(output_path, self.request.id)
@@ -1,13 +1,46 @@
 # ── webapp.py ────────────────────────────────────────────────
+import asyncio
+import json
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from typing import List, Optional
+import redis.asyncio as aioredis
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from celery.result import AsyncResult
 from videobot.tasks import run_video_job   # Celery task wrapper
+from videobot import engine, progress
+from celery_app import result_url
+from event_hub import EventHub
+import render_cache
+import corpus
 
-app = FastAPI(title="Quote-Video-Maker API", version="0.4.1")
+hub = EventHub(result_url, progress.CHANNEL)   # one pub/sub subscription per process
+TERMINAL  = {"done", "error"}
+HEARTBEAT = 15.0                               # seconds between keep-alives on idle streams
+MAX_BATCH = 1000                               # job ids per POST /status
+
+# status reads go straight to the Celery result keys over a pooled async
+# client – no blocking AsyncResult round-trip on the event loop
+backend = run_video_job.backend
+_results = None
+
+def result_client():
+    """Async Redis client on the result backend (made on first use); None when it isn't Redis."""
+    global _results
+    if _results is None and result_url.startswith(("redis://", "rediss://")):
+        _results = aioredis.from_url(result_url, max_connections=64)
+    return _results
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await hub.close()
+    if _results is not None:
+        await _results.aclose()
+
+app = FastAPI(title="Quote-Video-Maker API", version="0.4.1", lifespan=lifespan)
 
 BASE_DIR        = Path(__file__).resolve().parent
 CUSTOMERS_DIR   = Path("/app/customers")          # worker writes here
@@ -19,6 +52,14 @@ def rel(*bits: str) -> str:
 class JobRequest(BaseModel):
     customer_name: str = Field(..., examples=["acme_inc"])
     number_of_videos: int = Field(1, ge=1, le=20)
+    autofit: bool = Field(False, description="fit each verse's font size to its box")
+    topic: Optional[str] = Field(None, examples=["love"],
+                                 description="random verses of a corpus topic (see /topics), or 'all'")
+    min_length: Optional[int] = Field(None, ge=1, description="shortest verse, in characters")
+    max_length: Optional[int] = Field(None, ge=1, description="longest verse, in characters")
+
+class StatusRequest(BaseModel):
+    job_ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH)
 
 # ───── build cfg dict (unchanged) ────────────────────────────
 def build_cfg(job: JobRequest) -> dict:
@@ -32,59 +73,158 @@ def build_cfg(job: JobRequest) -> dict:
         "image_file":       rel("sources", "logo.png"),
         "customer_name":    job.customer_name,
         "number_of_videos": job.number_of_videos,
-        "fonts_paths": [
-            rel("sources", "fonts", "CoffeeJellyUmai.ttf"),
-            rel("sources", "fonts", "CourierprimecodeRegular.ttf"),
-            rel("sources", "fonts", "PineappleDays.ttf"),
-            rel("sources", "fonts", "GreenTeaJelly.ttf"),
-            rel("sources", "fonts", "HeyMarch.ttf"),
-            rel("sources", "fonts", "LetsCoffee.ttf"),
-            rel("sources", "fonts", "LikeSlim.ttf"),
-            rel("sources", "fonts", "SunnySpellsBasicRegular.ttf"),
-            rel("sources", "fonts", "TakeCoffee.ttf"),
-            rel("sources", "fonts", "WantCoffee.ttf"),
-        ],
-        "fonts_sizes":        [95, 70, 65, 85, 75, 50, 75, 87, 50, 65],
-        "fonts_maxcharsline": [34, 25, 30, 45, 33, 34, 35, 32, 35, 35],
+        "autofit":          job.autofit,
+        "topic":            job.topic,
+        "min_length":       job.min_length,
+        "max_length":       job.max_length,
+        **engine.font_cfg(rel("sources", "fonts")),
     }
 
 # ───── routes ────────────────────────────────────────────────
 @app.post("/generate")
 async def generate(job: JobRequest):
-    task = run_video_job.apply_async(args=[build_cfg(job)])
+    if job.topic and job.topic != corpus.ALL_TOPICS:
+        if job.topic not in {t["topic"] for t in await run_in_threadpool(corpus.topics)}:
+            raise HTTPException(400, f"unknown topic {job.topic!r}")
+    # broker publish is blocking I/O: keep it off the event loop
+    task = await run_in_threadpool(run_video_job.apply_async, args=[build_cfg(job)])
     return {"job_id": task.id, "status": "queued"}
 
 def list_videos(folder: Path) -> List[str]:
     """Return .mp4 file names (not paths) in the given customer folder."""
     return [p.name for p in folder.glob("*.mp4")]
 
-@app.get("/status/{job_id}")
-async def status(job_id: str):
-    res = AsyncResult(job_id, app=run_video_job.app)
+def done_payload(data: dict) -> dict:
+    """A finished job's result dict → the "done" response, with download URLs."""
+    folder_path = Path(data["folder"])
+    files = data["files"]
 
-    if res.state in ("PENDING", "RECEIVED"):
+    download_urls = [
+        f"{app.root_path or ''}/download/{folder_path.name}/{fn}"
+        for fn in files
+    ]
+    return {
+        "status": "done",
+        "folder": data["folder"],
+        "files": files,
+        "download_urls": download_urls,
+    }
+
+def state_payload(meta) -> dict:
+    """A decoded celery-task-meta (None = no such key yet) → the /status response."""
+    if meta is None:
         return {"status": "queued"}
-    if res.state == "STARTED":
+    state, result = meta["status"], meta["result"]
+
+    if state in ("PENDING", "RECEIVED", "RETRY"):
+        return {"status": "queued"}
+    if state == "STARTED":
         return {"status": "working"}
-    if res.state == "FAILURE":
-        return {"status": "error", "detail": str(res.result)}
-    if res.state == "SUCCESS":
-        data = res.result               # the dict we returned above
-        folder_path = Path(data["folder"])
-        files = data["files"]
-
-        download_urls = [
-            f"{app.root_path or ''}/download/{folder_path.name}/{fn}"
-            for fn in files
-        ]
-        return {
-            "status": "done",
-            "folder": data["folder"],
-            "files": files,
-            "download_urls": download_urls,
-        }
-
-    raise HTTPException(500, f"unknown state {res.state}")
+    if state == "PROGRESS":
+        # encode numbers from the workers (videobot/progress.py); ETA as of now
+        info = dict(result or {})
+        info["eta"] = progress.eta(info.get("started"), info.get("percent", 0))
+        return {"status": "working", **info}
+    if state == "FAILURE":
+        return {"status": "error", "detail": str(result)}
+    if state == "SUCCESS":
+        return done_payload(result)      # the dict the job returned
+
+    # REVOKED or a custom state: this job's entry only, never the whole batch / stream
+    return {"status": "error", "detail": f"unknown state {state}"}
+
+async def snapshot(job_ids: List[str]) -> List[dict]:
+    """
+    The /status response of every job: one MGET round-trip on a Redis
+    backend, else the backend's own reads in the threadpool.
+    """
+    r = result_client()
+    if r is None:
+        metas = await run_in_threadpool(lambda: [backend.get_task_meta(job_id) for job_id in job_ids])
+    else:
+        raws = await r.mget([backend.get_key_for_task(job_id) for job_id in job_ids])
+        metas = [None if raw is None else backend.decode_result(raw) for raw in raws]
+    return [state_payload(meta) for meta in metas]
+
+@app.get("/status/{job_id}")
+async def status(job_id: str):
+    return (await snapshot([job_id]))[0]
+
+@app.post("/status")
+async def batch_status(req: StatusRequest):
+    """{job_id: /status response} for many jobs in one MGET round-trip."""
+    return dict(zip(req.job_ids, await snapshot(req.job_ids)))
+
+# ───── push: SSE / WebSocket ─────────────────────────────────
+async def job_events(job_ids: List[str]):
+    """
+    Current status of every job, then its live events (via the hub) until
+    all of them are done or failed; None = nothing happened for HEARTBEAT s.
+    Idle streams re-read the status of their pending jobs, so an event
+    lost while the hub re-subscribed still arrives, late.
+    """
+    pending, last = set(job_ids), {}
+
+    def seen(event):
+        last[event["job_id"]] = event["status"]
+        if event["status"] in TERMINAL:
+            pending.discard(event["job_id"])
+        return event
+
+    async with hub.listen(job_ids) as queue:   # subscribed: the snapshot can't miss an event
+        for job_id, payload in zip(job_ids, await snapshot(job_ids)):
+            yield seen({"job_id": job_id, **payload})
+        while pending:
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                ids = sorted(pending)
+                changed = [{"job_id": job_id, **payload}
+                           for job_id, payload in zip(ids, await snapshot(ids))
+                           if payload["status"] != last.get(job_id)]
+                for event in changed:
+                    yield seen(event)
+                if not changed:
+                    yield None
+                continue
+            if event["status"] == "done":
+                event = {"job_id": event["job_id"], **done_payload(event)}
+            yield seen(event)
+
+@app.get("/events")
+async def events(job_id: List[str] = Query(..., description="one or more job ids")):
+    """Server-sent events: `event: <status>` + the /status JSON (with job_id) per change."""
+    async def stream():
+        async for event in job_events(job_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['status']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws")
+async def ws_events(websocket: WebSocket, job_id: List[str] = Query(...)):
+    """Same events as /events, one JSON message each; closed once every job ended."""
+    await websocket.accept()
+    try:
+        async for event in job_events(job_id):
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/topics")
+def topics():
+    """Corpus topics and how many verses each has."""
+    return corpus.topics()
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Render-cache hit/miss counters and size (shared by all workers)."""
+    return render_cache.stats()
 
 @app.get("/download/{path:path}")
 def download(path: str):